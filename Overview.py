@@ -1,6 +1,10 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime, timedelta
+import numpy as np
+import os
+import re
+from urllib.parse import quote
+from data_loading import USERS_DATE_LOCAL, load_users_date_local
 
 # Page config
 st.set_page_config(page_title="Overview", page_icon="🏢", layout="wide")
@@ -8,89 +12,99 @@ st.set_page_config(page_title="Overview", page_icon="🏢", layout="wide")
 # Page title
 st.title("🏢 Organization Overview")
 
-# Create two columns for Trial and Paying organizations
-col1, col2 = st.columns(2)
+# 기업명 링크 템플릿 (링크 생성과 표시용 정규식이 같은 prefix를 공유)
+ORG_LINK_PREFIX = "Usage_Summary?selected_org="
 
-with col1:
-    # 1. users.xlsx의 'date' 시트만 불러오기
-    excel_file = "users.xlsx"
-    df = pd.read_excel(excel_file, sheet_name="date")
+# 각 기업명을 Usage Summary 페이지 링크로 만들기 (쿼리 값은 URL 인코딩)
+def make_org_links(org_names):
+    return [ORG_LINK_PREFIX + quote(o) for o in org_names]
 
-    # 2. status가 'trial'인 기업만 필터
-    trial_df = df[df['status'].str.strip().str.lower() == 'trial'].copy()
-    
-    # Trial Organizations 제목과 조직 수 표시
-    st.header(f"Trial Organizations ({len(trial_df)})")
+@st.cache_data(show_spinner=False)
+def build_org_tables(mtime: float, today: pd.Timestamp) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Build the display frames for the Trial and Paying tables.
+    The tables only change when the workbook changes or the day rolls over (status emoji),
+    so `mtime` and `today` are the cache key."""
+    # 1. users.xlsx의 'date' 시트만 불러오기 (Usage Summary 페이지와 같은 Parquet 사본 사용)
+    df = load_users_date_local()
 
-    # 3. 날짜 컬럼 변환
-    trial_df['trial_start_date'] = pd.to_datetime(trial_df['trial_start_date']).dt.strftime('%Y-%m-%d')
-    trial_df['trial_end_date'] = pd.to_datetime(trial_df['trial_end_date'])
+    # status 정규화는 한 번만 수행하고 trial / paying 필터에서 공유
+    status = df['status'].str.strip().str.lower().astype('category')
 
-    # 4. trial end date 표시 설정
-    trial_df['trial_end_date_display'] = trial_df['trial_end_date'].dt.strftime('%Y-%m-%d')
-    trial_df.loc[pd.isnull(trial_df['trial_end_date']), 'trial_end_date_display'] = 'Ongoing'
+    # 2. status가 'trial' / 'paying'인 기업 필터 (필요한 컬럼만 골라서 복사)
+    # 기업명이 빈 행은 링크를 만들 수 없으므로 제외 (quote()가 NA에서 TypeError)
+    has_org = df['organization'].notna()
+    trial_df = df.loc[status.eq('trial') & has_org, ['organization', 'trial_start_date', 'trial_end_date']].copy()
+    paying_df = df.loc[status.eq('paying') & has_org, ['organization']]
 
-    # 5. 정렬: trial end date 오름차순, null은 마지막
-    trial_df['trial_end_date_sort'] = trial_df['trial_end_date'].fillna(pd.Timestamp.max)
-    trial_df = trial_df.sort_values('trial_end_date_sort')
+    # 3. 정렬: trial end date 오름차순, null은 마지막
+    trial_df = trial_df.sort_values('trial_end_date', na_position='last')
 
-    # 6. Trial Duration 설정 (상태 이모지 포함)
-    def get_status_emoji(end_date):
-        if pd.isna(end_date):
-            return '🟢'  # 초록색 (Ongoing)
-        
-        today = pd.Timestamp.now()
-        days_remaining = (end_date - today).days
-        
-        if days_remaining < 0:
-            return '🔴'  # 빨간색 (종료됨)
-        elif days_remaining <= 7:
-            return '🟡'  # 노란색 (7일 이내)
-        else:
-            return '🟢'  # 초록색 (7일 이상)
+    # 4. 상태 이모지
+    # 🟢 Ongoing 또는 7일 초과 / 🟡 7일 이내 / 🔴 종료됨
+    # 캐시 키인 today(자정) 기준으로 계산해서 하루 동안 결과가 바뀌지 않도록 함
+    # (종료일 - 현재 시각).days는 자정 이후라면 항상 (종료일 - today).days - 1 과 같음
+    days_remaining = (trial_df['trial_end_date'] - today).dt.days - 1
+    trial_df['Status'] = np.select(
+        [trial_df['trial_end_date'].isna(), days_remaining.lt(0), days_remaining.le(7)],
+        ['🟢', '🔴', '🟡'],
+        default='🟢',
+    )
 
-    trial_df['Status'] = trial_df['trial_end_date'].apply(get_status_emoji)
-    trial_df['Trial Duration'] = trial_df['Status'] + ' ' + trial_df['trial_start_date'] + ' ~ ' + trial_df['trial_end_date_display']
+    # 5. Trial Duration 설정 (날짜 컬럼은 datetime으로 두고 표시 문자열만 한 번 포맷, end date가 없으면 Ongoing)
+    start_display = trial_df['trial_start_date'].dt.strftime('%Y-%m-%d')
+    end_display = trial_df['trial_end_date'].dt.strftime('%Y-%m-%d').fillna('Ongoing')
+    trial_df['Trial Duration'] = [
+        f"{emoji} {start} ~ {end}"
+        for emoji, start, end in zip(trial_df['Status'], start_display, end_display)
+    ]
 
-    # 표에 표시할 컬럼만 추출 (기업명, 기간)
-    show_df = trial_df[['organization', 'Trial Duration']].rename(columns={'organization': 'Organization'})
+    # 표에 표시할 컬럼만 추출 (기업명 링크, 기간 / 기업명 링크)
+    show_df = pd.DataFrame({
+        'Organization': make_org_links(trial_df['organization']),
+        'Trial Duration': trial_df['Trial Duration'],
+    }, index=trial_df.index)
+    show_paying_df = pd.DataFrame({
+        'Organization': make_org_links(paying_df['organization']),
+    }, index=paying_df.index)
+    return show_df, show_paying_df
 
-    # 각 기업명을 클릭 가능한 링크로 만들기
-    def make_clickable(org_name):
-        return f'<a target="_self" href="Usage_Summary?selected_org={org_name}">{org_name}</a>'
+show_df, show_paying_df = build_org_tables(
+    os.path.getmtime(USERS_DATE_LOCAL),
+    pd.Timestamp.now().normalize(),
+)
 
-    # HTML로 링크가 작동하는 데이터프레임 표시
+# 링크 셀에는 URL에서 기업명만 추출해서 표시
+org_link_column = st.column_config.LinkColumn("Organization", display_text=re.escape(ORG_LINK_PREFIX) + "(.*)")
+
+# Create two columns for Trial and Paying organizations
+col1, col2 = st.columns(2)
+
+with col1:
+    # Trial Organizations 제목과 조직 수 표시
+    st.header(f"Trial Organizations ({len(show_df)})")
+
+    # LinkColumn으로 링크가 작동하는 데이터프레임 표시
     st.write("Click on the organization name to view detailed usage summary:")
     
-    # Convert the DataFrame to HTML with clickable links
-    show_df_html = show_df.copy()
-    show_df_html['Organization'] = show_df_html['Organization'].apply(make_clickable)
-    
-    st.write(
-        show_df_html.to_html(escape=False, index=False),
-        unsafe_allow_html=True
+    st.dataframe(
+        show_df,
+        column_config={"Organization": org_link_column},
+        hide_index=True,
+        use_container_width=True
     )
 
 with col2:
     st.header("Paying Organizations")
     
-    # Paying 기업 필터링
-    paying_df = df[df['status'].str.strip().str.lower() == 'paying'].copy()
-    
-    if not paying_df.empty:
-        # 표에 표시할 컬럼만 추출 (기업명)
-        show_paying_df = paying_df[['organization']].rename(columns={'organization': 'Organization'})
-        
-        # 각 기업명을 클릭 가능한 링크로 만들기
-        show_paying_df_html = show_paying_df.copy()
-        show_paying_df_html['Organization'] = show_paying_df_html['Organization'].apply(make_clickable)
-        
-        # HTML로 링크가 작동하는 데이터프레임 표시
+    if not show_paying_df.empty:
+        # LinkColumn으로 링크가 작동하는 데이터프레임 표시
         st.write("Click on the organization name to view detailed usage summary:")
         
-        st.write(
-            show_paying_df_html.to_html(escape=False, index=False),
-            unsafe_allow_html=True
+        st.dataframe(
+            show_paying_df,
+            column_config={"Organization": org_link_column},
+            hide_index=True,
+            use_container_width=True
         )
     else:
-        st.info("No paying organizations yet.") 
\ No newline at end of file
+        st.info("No paying organizations yet.")
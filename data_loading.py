@@ -0,0 +1,68 @@
+import os
+import hashlib
+import tempfile
+import pandas as pd
+
+def parquet_copy_path(stem: str, *schema) -> str:
+    """File name of the Parquet copy written by a reader described by `schema`.
+    `schema` lists the reader's columns, dtypes and parse settings; they are hashed into the
+    name so that changing the reader stops an older copy from being picked up."""
+    tag = hashlib.sha1(repr(schema).encode()).hexdigest()[:8]
+    return f"{stem}.{tag}.parquet"
+
+# users.xlsx의 'date' 시트 - Overview와 Usage Summary가 같은 Parquet 사본을 공유
+USERS_DATE_LOCAL = "users.xlsx"
+USERS_DATE_COLUMNS = ["organization", "status", "trial_start_date", "trial_end_date"]
+USERS_DATE_DTYPES = {"organization": "string[pyarrow]", "status": "string[pyarrow]"}
+USERS_DATE_PARSE_DATES = ["trial_start_date", "trial_end_date"]
+USERS_DATE_PARQUET = parquet_copy_path("users.date", USERS_DATE_COLUMNS, USERS_DATE_DTYPES, USERS_DATE_PARSE_DATES)
+
+# calamine이 없으면 openpyxl을 read-only 모드로 사용 (셀 객체 그래프를 만들지 않고 행 단위로 스트리밍)
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_READ_KWARGS = {"engine": "calamine"}
+except ImportError:
+    EXCEL_READ_KWARGS = {"engine": "openpyxl", "engine_kwargs": {"read_only": True, "data_only": True}}
+
+def read_excel_via_parquet(path: str, parquet_path: str, read_excel) -> pd.DataFrame:
+    """Read a local workbook through a Parquet copy kept next to it.
+    The copy is used while it is newer than the xlsx; otherwise, or if the copy cannot be read,
+    `read_excel(path)` is called and the copy is rewritten from its result."""
+    if os.path.exists(parquet_path) and os.path.getmtime(parquet_path) >= os.path.getmtime(path):
+        try:
+            return pd.read_parquet(parquet_path)
+        except (OSError, ValueError):
+            # 깨진 사본(중간에 끊긴 쓰기 등)은 지우고 xlsx에서 다시 만듦
+            try:
+                os.remove(parquet_path)
+            except OSError:
+                pass
+    df = read_excel(path)
+    # 같은 디렉터리의 임시 파일에 쓴 뒤 os.replace로 교체 (다른 세션이 쓰다 만 파일을 읽지 않도록)
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(parquet_path) or ".", suffix=".parquet.tmp")
+        os.close(fd)
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, parquet_path)
+    except (OSError, ValueError, TypeError):
+        # 읽기 전용 환경이나 Parquet로 저장할 수 없는 컬럼이 있으면 사본 없이 진행
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return df
+
+def read_users_date_excel(source) -> pd.DataFrame:
+    """Read the 'date' sheet of users.xlsx, keeping only USERS_DATE_COLUMNS."""
+    return pd.read_excel(
+        source,
+        sheet_name="date",
+        usecols=USERS_DATE_COLUMNS,
+        dtype=USERS_DATE_DTYPES,
+        parse_dates=USERS_DATE_PARSE_DATES,
+        **EXCEL_READ_KWARGS,
+    )
+
+def load_users_date_local() -> pd.DataFrame:
+    """Load the local users.xlsx 'date' sheet through its shared Parquet copy.
+    The Parquet round trip does not keep the pyarrow string storage, so the dtype map is reapplied."""
+    return read_excel_via_parquet(USERS_DATE_LOCAL, USERS_DATE_PARQUET, read_users_date_excel).astype(USERS_DATE_DTYPES)
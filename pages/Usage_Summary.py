@@ -1,10 +1,11 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import altair as alt
-import matplotlib.pyplot as plt
 from urllib.parse import parse_qs
-import os, requests, io
+import os, re, requests, io, hashlib
+from data_loading import USERS_DATE_LOCAL, parquet_copy_path, read_excel_via_parquet, read_users_date_excel, load_users_date_local
 
 # Page config
 st.set_page_config(page_title="Usage Summary", page_icon="📊", layout="wide")
@@ -17,26 +18,96 @@ if st.button("🔄 Clear Cache & Refresh"):
 USAGE_LOCAL = "df_usage.xlsx"
 USAGE_URL = "https://raw.githubusercontent.com/ghann670/streamlit/main/df_usage.xlsx"
 
+# df_usage 원본 컬럼 -> 내부 컬럼 이름 (원본 표기는 대소문자/공백/밑줄 차이를 무시하고 매칭)
+USAGE_COLUMNS = {
+    "User Email": "user_email",
+    "User Name": "user_name",
+    "Organization": "organization",
+    "Created At": "created_at",
+    "Function Mode": "function_mode",
+    "Selected Model": "selected_model",
+    "Sender": "sender",
+    "Time To First Byte": "time_to_first_byte",
+    "Status": "status",
+    "Division": "division",
+    "Trial Start Date": "trial_start_date",
+    "ID": "id",
+}
+
+# 'Created At' 텍스트 값의 형식 (예: "2025-07-04 07:48:31 UTC"), 형식 추론 없이 파싱
+CREATED_AT_FORMAT = "%Y-%m-%d %H:%M:%S %Z"
+
+# usecols용: 원본 컬럼명을 USAGE_COLUMNS 키와 같은 방식으로 정규화한 집합
+USAGE_COLUMN_KEYS = {src.lower().replace(" ", "") for src in USAGE_COLUMNS}
+
+# Parquet 사본 이름에 읽기 설정(컬럼 / 파싱 형식)을 태그로 넣어서 설정이 바뀌면 예전 사본을 쓰지 않음
+USAGE_PARQUET = parquet_copy_path("df_usage", USAGE_COLUMNS, CREATED_AT_FORMAT, "utc")
+
 USERS_LOCAL = "df_users.xlsx"
 USERS_URL = "https://raw.githubusercontent.com/ghann670/streamlit_new/main/df_users.xlsx"
+# df_users에서 실제로 사용하는 컬럼 (user_email 외에는 category로 저장)
+USERS_COLUMNS = ("user_email", "organization", "status", "earnings", "briefing")
+USERS_CATEGORY_COLUMNS = ("organization", "status", "earnings", "briefing")
+USERS_PARQUET = parquet_copy_path("df_users", USERS_COLUMNS, USERS_CATEGORY_COLUMNS)
 
-USERS_DATE_LOCAL = "users.xlsx"
+# users.xlsx date 시트의 로컬 경로 / Parquet 사본 / 컬럼은 Overview와 공유 (data_loading)
 USERS_DATE_URL = "https://raw.githubusercontent.com/ghann670/streamlit_new/main/users.xlsx"
 
+# 원격 xlsx 응답 본문과 ETag를 저장하는 디렉터리 (304 Not Modified면 다시 받지 않음)
+HTTP_CACHE_DIR = ".http_cache"
+
+# 응답 시간 분석 시작일 (이 날짜부터 오늘 전날까지의 요청만 분석)
+RESPONSE_TIME_START = pd.Timestamp('2025-04-01')
+
+def fetch_remote_bytes(url: str) -> bytes:
+    """GET `url` with If-None-Match and return the body.
+    The body and ETag of the last 200 response are kept in HTTP_CACHE_DIR, so a 304 answer
+    is served from disk instead of downloading the workbook again."""
+    cache_path = os.path.join(HTTP_CACHE_DIR, hashlib.sha1(url.encode()).hexdigest())
+    headers = {}
+    if os.path.exists(cache_path + ".body") and os.path.exists(cache_path + ".etag"):
+        with open(cache_path + ".etag") as f:
+            headers["If-None-Match"] = f.read()
+
+    r = requests.get(url, headers=headers, timeout=30)
+    if r.status_code == 304:
+        with open(cache_path + ".body", "rb") as f:
+            return f.read()
+    r.raise_for_status()
+
+    etag = r.headers.get("ETag")
+    if etag:
+        try:
+            os.makedirs(HTTP_CACHE_DIR, exist_ok=True)
+            with open(cache_path + ".body", "wb") as f:
+                f.write(r.content)
+            with open(cache_path + ".etag", "w") as f:
+                f.write(etag)
+        except OSError:
+            pass  # 쓰기 불가 환경에서는 캐시 없이 진행
+    return r.content
+
+def read_users_excel(source) -> pd.DataFrame:
+    """Read df_users.xlsx, keeping only USERS_COLUMNS.
+    Low-cardinality columns are stored as category (user_email stays a string, one per row)."""
+    df = pd.read_excel(source, usecols=lambda c: c in USERS_COLUMNS)
+    for col in USERS_CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    return df
+
 @st.cache_data(show_spinner=False)
 def load_trial_dates_df() -> pd.DataFrame:
     """Load trial dates data from users.xlsx date sheet"""
     # Try local first
     if os.path.exists(USERS_DATE_LOCAL):
         try:
-            return pd.read_excel(USERS_DATE_LOCAL, sheet_name='date')
+            return load_users_date_local()
         except Exception as e:
             st.warning(f"Failed to read local '{USERS_DATE_LOCAL}' date sheet: {e}. Falling back to remote…")
     # Fall back to remote
     try:
-        r = requests.get(USERS_DATE_URL, timeout=30)
-        r.raise_for_status()
-        return pd.read_excel(io.BytesIO(r.content), sheet_name='date')
+        return read_users_date_excel(io.BytesIO(fetch_remote_bytes(USERS_DATE_URL)))
     except Exception as e:
         st.error("Failed to load trial dates data from both local file and remote URL.")
         st.stop()
@@ -48,95 +119,151 @@ def load_users_df() -> pd.DataFrame:
     # Try local first
     if os.path.exists(USERS_LOCAL):
         try:
-            return pd.read_excel(USERS_LOCAL)
+            return read_excel_via_parquet(USERS_LOCAL, USERS_PARQUET, read_users_excel)
         except Exception as e:
             st.warning(f"Failed to read local '{USERS_LOCAL}': {e}. Falling back to remote…")
     # Fall back to remote
     try:
-        r = requests.get(USERS_URL, timeout=30)
-        r.raise_for_status()
-        return pd.read_excel(io.BytesIO(r.content))
+        return read_users_excel(io.BytesIO(fetch_remote_bytes(USERS_URL)))
     except Exception as e:
         st.error("Failed to load users data from both local file and remote URL. Please check the data source.")
         st.stop()
 
+def match_usage_columns(columns: pd.Index) -> dict:
+    """Map the usage workbook's column names to the internal names in USAGE_COLUMNS.
+    Names are compared ignoring case, spaces and underscores."""
+    # 컬럼명 정규화 (소문자, 공백/밑줄 제거)를 Index 전체에 한 번에 적용
+    normalized_cols = columns.astype(str).str.lower().str.replace(r"[\s_]+", "", regex=True)
+    colmap = dict(zip(normalized_cols, columns))
+
+    rename_map = {}
+    for src, dst in USAGE_COLUMNS.items():
+        src_col = colmap.get(src.lower().replace(" ", ""))
+        if src_col:
+            rename_map[src_col] = dst
+    return rename_map
+
+def read_usage_excel(source) -> pd.DataFrame:
+    """Read the usage workbook, keeping only the columns listed in USAGE_COLUMNS.
+    'Created At' mixes text and Excel datetimes, so it is parsed to UTC here to give the
+    column a single type that can be stored in Parquet."""
+    df = pd.read_excel(source, usecols=lambda c: re.sub(r"[\s_]+", "", str(c).lower()) in USAGE_COLUMN_KEYS)
+    rename_map = match_usage_columns(df.columns)
+    df = df[list(rename_map)]
+    for src, dst in rename_map.items():
+        if dst == "created_at":
+            df[src] = pd.to_datetime(df[src], format=CREATED_AT_FORMAT, errors='coerce', utc=True)
+    return df
+
 @st.cache_data(show_spinner=False)
 def load_usage_df() -> pd.DataFrame:
     """Load usage data from local file if available, else fall back to remote URL.
-    Stops the app with an error message if both sources fail."""
+    The local workbook is converted to a Parquet copy once and that copy is read while it
+    is newer than the xlsx. Stops the app with an error message if both sources fail."""
     # Try local first
     if os.path.exists(USAGE_LOCAL):
         try:
-            return pd.read_excel(USAGE_LOCAL)
+            return read_excel_via_parquet(USAGE_LOCAL, USAGE_PARQUET, read_usage_excel)
         except Exception as e:
             st.warning(f"Failed to read local '{USAGE_LOCAL}': {e}. Falling back to remote…")
     # Fall back to remote
     try:
-        r = requests.get(USAGE_URL, timeout=30)
-        r.raise_for_status()
-        return pd.read_excel(io.BytesIO(r.content))
+        return read_usage_excel(io.BytesIO(fetch_remote_bytes(USAGE_URL)))
     except Exception as e:
         st.error("Failed to load usage data from both local file and remote URL. Please check the data source.")
         st.stop()
 
 
-df_usage = load_usage_df()
-df_users = load_users_df()
-df_trial_dates = load_trial_dates_df()
-
-# df_usage 전처리 (df_all 대신 직접 사용)
-# normalize helper
-_norm = lambda s: "".join(str(s).strip().lower().replace("_", " ").split())
-colmap = {_norm(c): c for c in df_usage.columns}
-get = lambda name: colmap.get(_norm(name))
-
-# rename to expected columns if present
-rename_map = {}
-for src, dst in [
-    ("User Email", "user_email"),
-    ("User Name", "user_name"),
-    ("Organization", "organization"),
-    ("Created At", "created_at"),
-    ("Function Mode", "function_mode"),
-    ("Selected Model", "selected_model"),
-    ("Sender", "sender"),
-    ("Time To First Byte", "time_to_first_byte"),
-    ("Status", "status"),
-    ("Division", "division"),
-    ("Trial Start Date", "trial_start_date"),
-    ("ID", "id"),
-]:
-    src_col = get(src)
-    if src_col:
-        rename_map[src_col] = dst
-
-df_usage = df_usage.rename(columns=rename_map)
-
-# datetime parsing for df_usage
-if "created_at" in df_usage.columns:
-    df_usage['created_at'] = pd.to_datetime(df_usage['created_at'], errors='coerce', utc=True).dt.tz_localize(None)
-if "trial_start_date" in df_usage.columns:
-    df_usage['trial_start_date'] = pd.to_datetime(df_usage['trial_start_date'], errors='coerce')
-
-# preprocessing for df_usage
-df_usage['day_bucket'] = df_usage['created_at'].dt.date if 'created_at' in df_usage.columns else pd.NaT
-df_usage['agent_type'] = df_usage['function_mode'].astype(str).str.split(":").str[0] if 'function_mode' in df_usage.columns else "normal"
-
-# 절감 시간 매핑
-time_map = {"deep_research": 40, "pulse_check": 30}
-df_usage["saved_minutes"] = df_usage["agent_type"].map(time_map).fillna(30)
+@st.cache_data(show_spinner=False)
+def build_usage_df() -> pd.DataFrame:
+    """Load usage data and apply column renaming, datetime parsing and derived columns.
+    Cached as one step so widget-triggered reruns skip the whole preprocessing."""
+    df_usage = load_usage_df()
+
+    # df_usage 전처리 (df_all 대신 직접 사용)
+    # rename to expected columns if present
+    df_usage = df_usage.rename(columns=match_usage_columns(df_usage.columns))
+
+    # datetime parsing for df_usage (created_at은 로드 시 이미 UTC로 파싱되어 있으므로 timezone만 제거)
+    if "created_at" in df_usage.columns:
+        df_usage['created_at'] = df_usage['created_at'].dt.tz_localize(None)
+    if "trial_start_date" in df_usage.columns:
+        df_usage['trial_start_date'] = pd.to_datetime(df_usage['trial_start_date'], errors='coerce')
+
+    # preprocessing for df_usage
+    df_usage['day_bucket'] = df_usage['created_at'].dt.normalize() if 'created_at' in df_usage.columns else pd.NaT
+    df_usage['agent_type'] = df_usage['function_mode'].astype(str).str.partition(":")[0] if 'function_mode' in df_usage.columns else "normal"
+
+    # 절감 시간 매핑
+    time_map = {"deep_research": 40, "pulse_check": 30}
+    df_usage["saved_minutes"] = df_usage["agent_type"].map(time_map).fillna(30)
+
+    # 반복되는 문자열 컬럼은 category로 변환 (groupby가 문자열 대신 정수 코드로 동작, 메모리 절약)
+    for col in ('organization', 'user_name', 'user_email', 'agent_type', 'status', 'function_mode', 'selected_model', 'sender', 'division'):
+        if col in df_usage.columns:
+            df_usage[col] = df_usage[col].astype('category')
+
+    return df_usage
+
+
+@st.cache_data(show_spinner=False)
+def get_org_list() -> list:
+    """Organizations in the usage data, ordered by event count (descending)."""
+    return build_usage_df().groupby('organization', observed=True).size().sort_values(ascending=False).index.tolist()
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def get_org_frames(selected_org: str) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Filter usage and users data for one organization.
+    Returns (df_usage_org, df_users_org, df_usage_active), cached per organization so that
+    reruns triggered by unrelated widgets skip the filtering."""
+    df_usage = build_usage_df()
+    df_users = load_users_df()
+    df_trial_dates = load_trial_dates_df()
+
+    # 선택된 조직의 usage 데이터 필터링
+    df_usage_org = df_usage[df_usage['organization'] == selected_org].copy()
+
+    # 다른 조직에만 있는 category 값은 제거 (groupby / value_counts에 빈 그룹이 생기지 않도록)
+    for col in df_usage_org.select_dtypes('category').columns:
+        df_usage_org[col] = df_usage_org[col].cat.remove_unused_categories()
+
+    # users.xlsx의 date 시트에서 정확한 trial_start_date 가져오기
+    org_trial_info = df_trial_dates[df_trial_dates['organization'] == selected_org]
+    if not org_trial_info.empty:
+        trial_start_date = pd.to_datetime(org_trial_info['trial_start_date'].iloc[0])
+    else:
+        # fallback: organization의 첫 이벤트 날짜 사용
+        if not df_usage_org.empty and not df_usage_org['created_at'].isna().all():
+            trial_start_date = df_usage_org['created_at'].min()
+        else:
+            trial_start_date = pd.Timestamp.now()
+
+    df_usage_org['trial_start_date'] = trial_start_date
+
+    # df_users에서 선택된 organization의 total users 계산
+    if 'organization' in df_users.columns:
+        df_users_org = df_users[df_users['organization'] == selected_org]
+    else:
+        # organization 컬럼이 없으면 전체 사용자
+        df_users_org = df_users
+
+    # df_usage_active 정의 (여러 섹션에서 사용)
+    if 'user_email' in df_users_org.columns and 'status' in df_users_org.columns:
+        # user_email은 category라 isin이 이메일 문자열 대신 category 코드로 비교됨 (중복 이메일은 미리 제거)
+        active_user_emails = df_users_org.loc[df_users_org['status'] == 'active', 'user_email'].unique()
+        df_usage_active = df_usage_org[df_usage_org['user_email'].isin(active_user_emails)]
+    else:
+        df_usage_active = df_usage_org  # fallback to all usage
+
+    return df_usage_org, df_users_org, df_usage_active
+
 
 # UI 설정
 st.title("\U0001F680 Usage Summary Dashboard")
 
-# 조직 리스트 추출 (df_usage 기준)
-org_event_counts = (
-    df_usage
-    .groupby('organization')
-    .size()
-    .sort_values(ascending=False)
-)
-org_list_sorted = org_event_counts.index.tolist()
+# 조직 리스트 추출 (df_usage 기준, 이벤트 수 내림차순)
+org_list_sorted = get_org_list()
 
 # URL에서 selected_org 파라미터 읽기
 default_org = st.query_params.get("selected_org", None)
@@ -150,55 +277,36 @@ else:
 # 조직 선택
 selected_org = st.selectbox("Select Organization", org_list_sorted, index=default_index)
 
-# 선택된 조직의 usage 데이터 필터링
-df_usage_org = df_usage[df_usage['organization'] == selected_org]
-
-# users.xlsx의 date 시트에서 정확한 trial_start_date 가져오기
-org_trial_info = df_trial_dates[df_trial_dates['organization'] == selected_org]
-if not org_trial_info.empty:
-    trial_start_date = pd.to_datetime(org_trial_info['trial_start_date'].iloc[0])
-else:
-    # fallback: organization의 첫 이벤트 날짜 사용
-    if not df_usage_org.empty and not df_usage_org['created_at'].isna().all():
-        trial_start_date = df_usage_org['created_at'].min()
-    else:
-        trial_start_date = pd.Timestamp.now()
-        
-df_usage_org['trial_start_date'] = trial_start_date
+# 선택된 조직의 usage / users 데이터 필터링 (조직별 캐시)
+df_usage_org, df_users_org, df_usage_active = get_org_frames(selected_org)
 
 # Metric 계산 - df_users.xlsx와 df_usage 기반으로 수정  
 total_events = len(df_usage_org)  # All Events = 선택된 조직의 usage 데이터 전체 카운트
 
-# df_users에서 선택된 organization의 total users 계산
-if 'organization' in df_users.columns:
-    df_users_org = df_users[df_users['organization'] == selected_org]
-else:
-    # organization 컬럼이 없으면 전체 사용자
-    df_users_org = df_users
-
 total_users = df_users_org['user_email'].nunique()  # 중복 제거
 
-# df_users에서 status가 'active'인 사용자 계산 (중복 제거)
+# df_users의 status별 사용자 계산 (status 컬럼을 한 번만 꺼내 active / invited / no-usage 마스크에 공유, 중복 제거)
 if 'status' in df_users_org.columns:
-    active_users = df_users_org[df_users_org['status'] == 'active']['user_email'].nunique()
+    user_status = df_users_org['status']
+    user_emails = df_users_org['user_email']
+    active_users = user_emails[user_status.eq('active')].nunique()
+    invited_emails = user_emails[user_status.eq('invited_not_joined')].dropna().unique()
+    # joined but no usage = status가 null/NaN인 사용자들
+    joined_no_usage_emails = user_emails[user_status.isna()].dropna().unique()
 else:
-    # status 컬럼이 없으면 모든 사용자를 active로 간주
+    # status 컬럼이 없으면 모든 사용자를 active로 간주하고 invited / no-usage는 빈 배열
     active_users = total_users
+    invited_emails = []
+    joined_no_usage_emails = []
 
 active_ratio = f"{active_users} / {total_users}"
 
-# df_usage_active 정의 (여러 섹션에서 사용)
-if 'user_email' in df_users_org.columns and 'status' in df_users_org.columns:
-    active_user_emails = df_users_org[df_users_org['status'] == 'active']['user_email'].tolist()
-    df_usage_active = df_usage_org[df_usage_org['user_email'].isin(active_user_emails)]
-else:
-    df_usage_active = df_usage_org  # fallback to all usage
-
-# Top user 계산
-if not df_usage_active['user_name'].dropna().empty:
-    top_user = df_usage_active['user_name'].value_counts().idxmax()
-    top_user_count = df_usage_active['user_name'].value_counts().max()
-    top_user_display = f"{top_user} ({top_user_count} times)"
+# Top user 계산 (value_counts는 내림차순 정렬이므로 첫 항목이 최다 사용자)
+# category 그대로 세면 동점일 때 category 순서로 정해지므로 object 값으로 세서 먼저 나온 유저를 우선
+# (이벤트가 없는 유저의 0 카운트도 생기지 않음)
+user_event_counts = df_usage_active['user_name'].astype(object).value_counts()
+if not user_event_counts.empty:
+    top_user_display = f"{user_event_counts.index[0]} ({user_event_counts.iloc[0]} times)"
 else:
     top_user_display = "N/A"
 
@@ -216,16 +324,7 @@ if not df_usage_active.empty and active_users > 0:
 else:
     saved_display = "—"
 
-# ✅ Invited & No-Usage Users 추출 - df_users.xlsx 기반으로 수정 (중복 제거)
-if 'status' in df_users_org.columns:
-    invited_emails = df_users_org[df_users_org['status'] == 'invited_not_joined']['user_email'].dropna().unique() if 'user_email' in df_users_org.columns else []
-    # joined but no usage = status가 null/NaN인 사용자들
-    joined_no_usage_emails = df_users_org[df_users_org['status'].isna()]['user_email'].dropna().unique() if 'user_email' in df_users_org.columns else []
-else:
-    # status 컬럼이 없으면 빈 배열
-    invited_emails = []
-    joined_no_usage_emails = []
-
+# ✅ Invited & No-Usage Users 표시 문자열 (위 status 계산 결과 사용)
 invited_display = ", ".join(invited_emails) if len(invited_emails) > 0 else "—"
 joined_display = ", ".join(joined_no_usage_emails) if len(joined_no_usage_emails) > 0 else "—"
 
@@ -237,12 +336,18 @@ col3.metric("Top User", top_user_display)
 
 col4, col5, col6 = st.columns(3)
 # earnings, briefings 정보는 df_users에서 가져오기 (중복 제거)
-earnings_users = df_users_org[df_users_org['earnings'] == 'onboarded']['user_email'].nunique() if 'earnings' in df_users_org.columns else 0
-briefing_users = df_users_org[df_users_org['briefing'] == 'onboarded']['user_email'].nunique() if 'briefing' in df_users_org.columns else 0
+# 두 컬럼을 한 번에 비교하고, 컬럼이 없으면 reindex로 생긴 빈 컬럼이라 0명이 됨
+onboarded = df_users_org.reindex(columns=['earnings', 'briefing']).eq('onboarded')
+earnings_users = df_users_org.loc[onboarded['earnings'], 'user_email'].nunique()
+briefing_users = df_users_org.loc[onboarded['briefing'], 'user_email'].nunique()
 col4.metric("Earnings/Briefing Users", f"{earnings_users}/{briefing_users}")
 col5.metric("Avg. Events per Active User", avg_events)
 col6.metric("Avg. Time Saved / User / Week", saved_display)
 
+# 유저 목록은 읽기 전용 text_area로 표시 (자체 스크롤바가 있어 긴 목록도 높이가 고정됨)
+def render_user_list(label: str, display: str) -> None:
+    st.text_area(label, value=display, height=68, disabled=True, label_visibility="collapsed")
+
 # User Status 섹션
 st.markdown("### 👥 User Status")
 
@@ -252,51 +357,16 @@ status_col1, status_col2 = st.columns(2)
 with status_col1:
     # 왼쪽 열
     st.markdown("**Invited but Not Joined**")
-    st.markdown(
-        f"""
-        <div style='
-            max-height: 60px;
-            overflow-y: auto;
-            font-size: 13px;
-            border: 1px solid #ccc;
-            padding: 6px;
-            border-radius: 5px;
-            background-color: #fffaf5;
-            margin-bottom: 15px;
-        '>
-            {invited_display}
-        </div>
-        """,
-        unsafe_allow_html=True
-    )
+    render_user_list("Invited but Not Joined", invited_display)
 
     st.markdown("**Joined but No Usage**")
-    st.markdown(
-        f"""
-        <div style='
-            max-height: 60px;
-            overflow-y: auto;
-            font-size: 13px;
-            border: 1px solid #ccc;
-            padding: 6px;
-            border-radius: 5px;
-            background-color: #f5faff;
-        '>
-            {joined_display}
-        </div>
-        """,
-        unsafe_allow_html=True
-    )
+    render_user_list("Joined but No Usage", joined_display)
 
 with status_col2:
-    # Normal만 사용한 유저 찾기
-    all_users = df_usage_org['user_name'].unique()
-    normal_only_users = []
-    for user in all_users:
-        user_types = df_usage_org[df_usage_org['user_name'] == user]['agent_type'].unique()
-        if len(user_types) == 1 and user_types[0] == 'normal':
-            normal_only_users.append(user)
-    normal_only_users.sort()
+    # Normal만 사용한 유저 찾기 (유저별 루프 대신 groupby 한 번으로 계산)
+    user_agent_types = df_usage_org.groupby('user_name', observed=True)['agent_type'].agg(['nunique', 'first'])
+    normal_only_mask = (user_agent_types['nunique'] == 1) & (user_agent_types['first'] == 'normal')
+    normal_only_users = sorted(normal_only_mask[normal_only_mask].index)
     normal_only_display = ", ".join(normal_only_users) if normal_only_users else "—"
 
     # Recent 2 Weeks Active Users 찾기 (최근 2주간 활성 사용자)
@@ -305,10 +375,11 @@ with status_col2:
         recent_date = df_usage_active['created_at'].max()
         if pd.notna(recent_date):
             two_weeks_ago = recent_date - pd.Timedelta(days=14)
-            recent_users = df_usage_active[df_usage_active['created_at'] >= two_weeks_ago]['user_name'].dropna().unique()
-            # 안전한 정렬을 위해 문자열 변환 후 빈 값 제거
-            recent_users_clean = [str(user) for user in recent_users if pd.notna(user) and str(user).strip()]
-            consistent_display = ", ".join(sorted(recent_users_clean)) if len(recent_users_clean) > 0 else "—"
+            recent_users = df_usage_active.loc[df_usage_active['created_at'] >= two_weeks_ago, 'user_name'].dropna()
+            # 안전한 정렬을 위해 문자열 변환 후 빈 값 제거 (Series 문자열 연산으로 한 번에 처리)
+            recent_users = recent_users.astype(str)
+            recent_users = recent_users[recent_users.str.strip().astype(bool)].unique()
+            consistent_display = ", ".join(sorted(recent_users)) or "—"
         else:
             consistent_display = "—"
     else:
@@ -316,41 +387,10 @@ with status_col2:
 
     # 오른쪽 열
     st.markdown("**Recent 2 Weeks Active Users**")
-    st.markdown(
-        f"""
-        <div style='
-            max-height: 60px;
-            overflow-y: auto;
-            font-size: 13px;
-            border: 1px solid #ccc;
-            padding: 6px;
-            border-radius: 5px;
-            background-color: #f5fff5;
-            margin-bottom: 15px;
-        '>
-            {consistent_display}
-        </div>
-        """,
-        unsafe_allow_html=True
-    )
+    render_user_list("Recent 2 Weeks Active Users", consistent_display)
 
     st.markdown("**Normal Function Only Users**")
-    st.markdown(
-        f"""
-        <div style='
-            max-height: 60px;
-            overflow-y: auto;
-            font-size: 13px;
-            border: 1px solid #ccc;
-            padding: 6px;
-            border-radius: 5px;
-            background-color: #fff5ff;
-        '>
-            {normal_only_display}
-        </div>
-        """,
-        unsafe_allow_html=True
-    )
+    render_user_list("Normal Function Only Users", normal_only_display)
 
 
 
@@ -362,100 +402,68 @@ st.subheader("📅 Total Usage Over Time (All Functions)")
 end_date = pd.Timestamp.now()
 default_start = pd.Timestamp('2025-01-01')
 
-# 조직별 trial_start_date 확인
-df_active_org = df_usage_active.copy()
-
+# 조직별 trial_start_date 확인 (프레임 전체를 복사하지 않고 이 컬럼만 조정)
 # 2024년 trial_start_date를 가진 조직은 2025-01-01부터 시작하도록 조정
-df_active_org.loc[df_active_org['trial_start_date'].dt.year == 2024, 'trial_start_date'] = default_start
-
-# 각 조직별로 데이터 처리
-org_data_list = []
-for org in df_active_org['organization'].unique():
-    org_df = df_active_org[df_active_org['organization'] == org]
-    
-    try:
-        # trial_start_date 처리
-        org_start = org_df['trial_start_date'].iloc[0]
-        
-        # end_date 처리 (현재 시간으로부터)
-        end_date = pd.Timestamp.now()
-        
-        # org_start가 유효한지 확인하고 처리
-        if pd.isna(org_start) or not isinstance(org_start, pd.Timestamp):
-            # created_at에서 최소값 찾기
-            if not org_df['created_at'].empty:
-                org_start = pd.to_datetime(org_df['created_at'].min())
-            else:
-                # 데이터가 없는 경우 스킵
-                continue
-        
-        # 날짜가 유효한지 최종 확인
-        if pd.isna(org_start) or pd.isna(end_date):
-            print(f"Invalid dates for org {org}: start={org_start}, end={end_date}")
-            continue
-            
-        # 시작일이 종료일보다 늦은 경우 처리
-        if org_start > end_date:
-            org_start = end_date
-        
-        # 해당 조직의 날짜 범위 생성
-        org_dates = pd.date_range(
-            start=org_start.normalize(),  # 시간 정보 제거
-            end=end_date.normalize(),     # 시간 정보 제거
-            freq='D'
-        )
-        
-        # 데이터프레임 생성 및 처리
-        org_date_df = pd.DataFrame({'created_at': org_dates})
-        
-        # 해당 조직의 실제 데이터 집계
-        org_counts = org_df.groupby(org_df["created_at"].dt.date).size().reset_index(name="count")
-        org_counts["created_at"] = pd.to_datetime(org_counts["created_at"])
-        
-        # 데이터 병합
-        org_daily = pd.merge(org_date_df, org_counts, on='created_at', how='left')
-        org_data_list.append(org_daily)
-        
-    except Exception as e:
-        print(f"Error processing org {org}: {str(e)}")
-        continue
-
-# 모든 조직의 데이터 합치기
-df_total_daily = pd.concat(org_data_list)
-df_total_daily = df_total_daily.groupby('created_at')['count'].sum().reset_index()
-df_total_daily['count'] = df_total_daily['count'].fillna(0)
+trial_start_dates = df_usage_active['trial_start_date']
+trial_start_dates = trial_start_dates.where(trial_start_dates.dt.year != 2024, default_start)
+
+# 조직 시작일 - 선택된 조직 하나로 이미 필터링되어 있으므로 조직별 groupby 없이 스칼라로 계산
+# (trial_start_date가 없으면 첫 이벤트 날짜, 현재 시점을 넘지 않도록 제한)
+# active 유저의 이벤트가 하나도 없으면 두 값 모두 NaT이므로 오늘 하루만 표시
+org_start = trial_start_dates.min()
+if pd.isna(org_start):
+    org_start = df_usage_active['created_at'].min()
+if pd.isna(org_start):
+    org_start = end_date
+org_start = min(org_start, end_date).normalize()
+
+# 시작일 이후 이벤트만 날짜별로 집계하고, 빈 날짜는 0으로 채움
+event_days = df_usage_active['day_bucket']
+daily_counts = event_days[event_days >= org_start].value_counts()
+df_total_daily = (
+    daily_counts
+    .reindex(pd.date_range(org_start, end_date.normalize(), freq='D'), fill_value=0)
+    .rename_axis('created_at')
+    .reset_index(name='count')
+)
 
 # ✅ 2️⃣ 날짜 라벨 생성 (예: 7/11)
 df_total_daily["date_label"] = df_total_daily["created_at"].dt.strftime("%-m/%d")  # macOS/Linux
 # 윈도우는 "%#m/%d"
 
 # ✅ Plotly 시계열 차트 (y축 상단 여유 포함)
-fig1 = px.line(
-    df_total_daily,
-    x="created_at",  # date_label 대신 created_at 사용
-    y="count",
-    markers=True,
-    labels={"created_at": "Date", "count": "Total Event Count"},
-)
+@st.cache_data(show_spinner=False, max_entries=32)
+def build_total_usage_fig(df_total_daily: pd.DataFrame):
+    """Build the Total Usage line chart.
+    Figures are cached on their input frames, so reruns from unrelated widgets skip the Plotly assembly."""
+    fig1 = px.line(
+        df_total_daily,
+        x="created_at",  # date_label 대신 created_at 사용
+        y="count",
+        markers=True,
+        labels={"created_at": "Date", "count": "Total Event Count"},
+    )
 
-# ✅ 차트 레이아웃 설정
-fig1.update_layout(
-    height=300,
-    width=900,
-    xaxis=dict(
-        rangeslider=dict(visible=True),  # 하단에 슬라이더 추가
-        type="date",
-        tickformat="%Y-%m-%d",
-                    range=[df_total_daily['created_at'].min(), df_total_daily['created_at'].max()]  # x축 범위 설정
-    ),
-    margin=dict(l=50, r=50, t=30, b=50)  # 여백 조정
-)
+    # ✅ 차트 레이아웃 설정
+    fig1.update_layout(
+        height=300,
+        width=900,
+        xaxis=dict(
+            rangeslider=dict(visible=True),  # 하단에 슬라이더 추가
+            type="date",
+            tickformat="%Y-%m-%d",
+            range=[df_total_daily['created_at'].min(), df_total_daily['created_at'].max()]  # x축 범위 설정
+        ),
+        margin=dict(l=50, r=50, t=30, b=50)  # 여백 조정
+    )
+
+    # ✅ y축 범위 자동보다 조금 더 크게 설정
+    max_count = df_total_daily["count"].max()
+    fig1.update_yaxes(range=[0, max_count + 10])
 
-# ✅ y축 범위 자동보다 조금 더 크게 설정
-max_count = df_total_daily["count"].max()
-fig1.update_yaxes(range=[0, max_count + 10])
+    return fig1
 
-st.plotly_chart(fig1, use_container_width=True)
+st.plotly_chart(build_total_usage_fig(df_total_daily), use_container_width=True)
 
 
 
@@ -465,17 +473,19 @@ st.markdown("### 👥 Users' Daily Usage (2025 Data Only)")
 
 # 유저별 일별 사용량 집계 (각 유저의 첫 사용일부터 현재까지)
 # 실제 사용량 데이터 집계 (2025년 데이터만)
-df_2025 = df_usage_active[df_usage_active['created_at'].dt.year == 2025]
+# (연도 추출 대신 datetime64 범위 비교로 필터)
+created_at = df_usage_active['created_at']
+df_2025 = df_usage_active[(created_at >= pd.Timestamp('2025-01-01')) & (created_at < pd.Timestamp('2026-01-01'))]
 
 # 각 유저의 첫 사용일 찾기 (2025년 기준)
-user_first_dates = df_2025.groupby('user_name')['created_at'].min().reset_index()
-user_first_dates['created_at'] = user_first_dates['created_at'].dt.date
+# (일 단위 키는 로드 시 만든 day_bucket을 재사용해서 매번 normalize 하지 않음)
+user_first_dates = df_2025.groupby('user_name', observed=True)['day_bucket'].min().rename('created_at').reset_index()
 user_counts = df_2025.groupby(
-    [df_2025["created_at"].dt.date, "user_name"]
+    [df_2025["day_bucket"].rename("created_at"), "user_name"], observed=True
 ).size().reset_index(name="count")
 
 # 유저별 total usage 수 기준 정렬
-user_total_counts = user_counts.groupby("user_name")["count"].sum()
+user_total_counts = user_counts.groupby("user_name", observed=True)["count"].sum()
 sorted_users = user_total_counts.sort_values(ascending=False).index.tolist()
 default_users = sorted_users[:3]  # 상위 3명 기본 선택
 
@@ -483,126 +493,113 @@ default_users = sorted_users[:3]  # 상위 3명 기본 선택
 if "selected_users" not in st.session_state:
     st.session_state.selected_users = default_users
 
-# 전체 선택 / 해제 버튼
-col1, col2 = st.columns([1, 1])
-with col1:
-    if st.button("✅ 전체 선택"):
-        st.session_state.selected_users = sorted_users
-with col2:
-    if st.button("❌ 전체 해제"):
-        st.session_state.selected_users = []
+# 표시할 때만 0을 '-'로 바꿔 보여줌 (프레임은 숫자 dtype 그대로 두고 Styler.format으로 사용)
+def format_dash_zero(value) -> str:
+    return '-' if value == 0 else str(value)
 
-# 멀티셀렉트 (세션 상태로 동기화, 유효성 보정)
-valid_default_users = [user for user in st.session_state.selected_users if user in sorted_users]
-
-selected_users = st.multiselect(
-    "Select users to display",
-    options=sorted_users,
-    default=valid_default_users,
-    key="selected_users"
-)
+# 유저 선택 변경 시 이 섹션만 다시 실행되도록 fragment로 분리
+@st.fragment
+def render_user_daily_section(df_2025: pd.DataFrame, sorted_users: list, user_first_dates: pd.DataFrame):
+    """Render the user picker with the per-user daily line chart and table."""
+    # 전체 선택 / 해제 버튼
+    col1, col2 = st.columns([1, 1])
+    with col1:
+        if st.button("✅ 전체 선택"):
+            st.session_state.selected_users = sorted_users
+    with col2:
+        if st.button("❌ 전체 해제"):
+            st.session_state.selected_users = []
 
-# 2025년 데이터의 최대 날짜 사용
-actual_end_date = df_2025['created_at'].max().date() if not df_2025.empty else pd.Timestamp.now().date()
+    # 멀티셀렉트 (세션 상태로 동기화, 유효성 보정)
+    valid_default_users = [user for user in st.session_state.selected_users if user in sorted_users]
 
-# 선택된 유저들의 데이터만 처리
-df_user_daily_list = []
-for user in selected_users:
-    user_start = user_first_dates[user_first_dates['user_name'] == user]['created_at'].iloc[0]
-    user_dates = pd.date_range(start=user_start, end=actual_end_date, freq='D')
-    
-    # 해당 유저의 날짜별 데이터 생성
-    user_df = pd.DataFrame({'created_at': user_dates})
-    user_df['user'] = user
-    
-    # 실제 데이터와 병합
-    user_counts_filtered = user_counts[user_counts['user_name'] == user].copy()
-    user_counts_filtered['created_at'] = pd.to_datetime(user_counts_filtered['created_at'])
-    
-    user_df = pd.merge(
-        user_df,
-        user_counts_filtered[['created_at', 'count']],
-        on='created_at',
-        how='left'
+    selected_users = st.multiselect(
+        "Select users to display",
+        options=sorted_users,
+        default=valid_default_users,
+        key="selected_users"
     )
-    df_user_daily_list.append(user_df)
 
-# 모든 유저 데이터 합치기
-if df_user_daily_list:
-    df_user_filtered = pd.concat(df_user_daily_list, ignore_index=True)
-    df_user_filtered['count'] = df_user_filtered['count'].fillna(0)
-    df_user_filtered["date_label"] = df_user_filtered["created_at"].dt.strftime("%-m/%d")
-else:
-    df_user_filtered = pd.DataFrame(columns=['created_at', 'user', 'count', 'date_label'])
+    # 2025년 데이터의 최대 날짜 사용
+    actual_end_date = df_2025['created_at'].max().date() if not df_2025.empty else pd.Timestamp.now().date()
+
+    # 선택된 유저들의 날짜별 사용량을 한 번에 집계 (날짜 x 유저 피벗, 빈 날짜는 0)
+    if selected_users:
+        first_date_map = user_first_dates.set_index('user_name')['created_at']
+        full_dates = pd.date_range(start=first_date_map[selected_users].min(), end=actual_end_date, freq='D')
+        daily_pivot = (
+            df_2025
+            .groupby([df_2025['day_bucket'].rename('created_at'), 'user_name'], observed=True)
+            .size()
+            .unstack('user_name', fill_value=0)
+            .reindex(index=full_dates, columns=selected_users, fill_value=0)
+            .rename_axis('created_at')
+        )
+        df_user_filtered = daily_pivot.reset_index().melt('created_at', var_name='user', value_name='count')
 
-# ✅ 라인차트 시각화
-if df_user_filtered.empty:
-    st.info("No data for selected users.")
-else:
-    chart_users = alt.Chart(df_user_filtered).mark_line(point=True).encode(
-        x=alt.X(
-            "created_at:T",
-            title="Date",
-            axis=alt.Axis(
-                labelAngle=0,
-                format="%m/%d",
-                tickCount={"interval": "day", "step": 1},  # 하루 간격으로 눈금 표시
-                grid=True
-            )
-        ),
-        y=alt.Y("count:Q", title="Event Count"),
-        color=alt.Color("user:N", title="User", sort=sorted_users),
-        tooltip=[
-            alt.Tooltip("created_at:T", title="Date", format="%Y-%m-%d"),
-            alt.Tooltip("user:N", title="User"),
-            alt.Tooltip("count:Q", title="Count")
-        ]
-    ).properties(width=900, height=300)
-    
-    st.altair_chart(chart_users, use_container_width=True)
+        # 각 유저의 첫 사용일 이전 날짜는 제외
+        df_user_filtered = df_user_filtered[
+            df_user_filtered['created_at'] >= df_user_filtered['user'].map(first_date_map)
+        ].reset_index(drop=True)
+        df_user_filtered["date_label"] = df_user_filtered["created_at"].dt.strftime("%-m/%d")
+    else:
+        df_user_filtered = pd.DataFrame(columns=['created_at', 'user', 'count', 'date_label'])
 
-    # 테이블 추가
-    st.markdown("#### Daily Usage Table")
-    
-    # 피벗 테이블 생성
-    df_user_filtered['date_col'] = df_user_filtered['created_at'].dt.strftime("%m/%d")
-    table_data = df_user_filtered.pivot_table(
-        index='user',
-        columns='date_col',
-        values='count',
-        fill_value=0
-    )
-    
-    # 날짜 컬럼을 시간순으로 정렬
-    date_columns = [col for col in table_data.columns if col != 'Total']
-    # 실제 데이터에서 해당 날짜의 연도를 찾아서 정렬
-    def get_actual_date_for_sorting(date_str):
-        matching_dates = df_user_filtered[df_user_filtered['created_at'].dt.strftime("%m/%d") == date_str]['created_at']
-        if not matching_dates.empty:
-            return matching_dates.min()
-        else:
-            return pd.to_datetime(f"2025/{date_str}")  # 2025년 기본값으로 변경
-    
-    sorted_date_columns = sorted(date_columns, key=get_actual_date_for_sorting)
-    
-    # Total 컬럼 추가
-    table_data['Total'] = table_data.sum(axis=1)
-    
-    # Total 기준으로 정렬
-    table_data = table_data.sort_values('Total', ascending=False)
-    
-    # Total을 맨 앞으로, 그 다음 날짜를 시간순으로 배치
-    cols = ['Total'] + sorted_date_columns
-    table_data = table_data[cols]
-    
-    # Total 행 추가
-    table_data.loc['Total'] = table_data.sum(numeric_only=True)
-    
-    # 0을 '-'로 대체하기 전에 정수로 변환
-    table_data = table_data.apply(lambda x: x.astype(float).astype(int) if pd.api.types.is_numeric_dtype(x) else x)
-    table_data = table_data.replace(0, '-')
-    
-    st.dataframe(table_data.astype(object), use_container_width=True)
+    # ✅ 라인차트 시각화
+    if df_user_filtered.empty:
+        st.info("No data for selected users.")
+    else:
+        chart_users = alt.Chart(df_user_filtered).mark_line(point=True).encode(
+            x=alt.X(
+                "created_at:T",
+                title="Date",
+                axis=alt.Axis(
+                    labelAngle=0,
+                    format="%m/%d",
+                    tickCount={"interval": "day", "step": 1},  # 하루 간격으로 눈금 표시
+                    grid=True
+                )
+            ),
+            y=alt.Y("count:Q", title="Event Count"),
+            color=alt.Color("user:N", title="User", sort=sorted_users),
+            tooltip=[
+                alt.Tooltip("created_at:T", title="Date", format="%Y-%m-%d"),
+                alt.Tooltip("user:N", title="User"),
+                alt.Tooltip("count:Q", title="Count")
+            ]
+        ).properties(width=900, height=300)
+
+        st.altair_chart(chart_users, use_container_width=True)
+
+        # 테이블 추가
+        st.markdown("#### Daily Usage Table")
+
+        # 피벗 테이블 + Total 행/열을 한 번에 생성 (날짜 컬럼은 datetime 그대로 두어 시간순으로 정렬)
+        table_data = df_user_filtered.pivot_table(
+            index='user',
+            columns='created_at',
+            values='count',
+            aggfunc='sum',
+            fill_value=0,
+            margins=True,
+            margins_name='Total',
+            observed=True
+        )
+
+        # 날짜 컬럼은 이미 시간순이므로 표시 형식(mm/dd)만 변경
+        sorted_date_columns = [d.strftime("%m/%d") for d in table_data.columns.drop('Total')]
+        table_data.columns = sorted_date_columns + ['Total']
+
+        # Total 기준으로 유저 정렬 (Total 행은 맨 아래 유지), Total을 맨 앞으로 그 다음 날짜를 시간순으로 배치
+        user_order = table_data['Total'].drop('Total').sort_values(ascending=False).index.tolist()
+        table_data = table_data.loc[user_order + ['Total'], ['Total'] + sorted_date_columns]
+
+        # 정수로 변환 (모든 컬럼이 숫자이므로 한 번에 변환), 0은 표시할 때만 '-'로
+        table_data = table_data.astype(int)
+
+        st.dataframe(table_data.style.format(format_dash_zero), use_container_width=True)
+
+render_user_daily_section(df_2025, sorted_users, user_first_dates)
 
 
 
@@ -626,45 +623,49 @@ view_mode = st.radio(
 
 st.subheader("📈 Weekly Function Usage Trends")
 
-# 주차 범위 설정 (Recent 4 Weeks 모드에서만 사용)
-if view_mode == "Recent 4 Weeks":
-    # 기준 날짜: 오늘 날짜 정오 기준
-    now = pd.Timestamp.now().normalize() + pd.Timedelta(hours=12)
-    
-    # 각 주차 범위 설정
-    week_ranges = {
+# 주차 버킷 할당 함수 (행별 apply 대신 pd.cut으로 한 번에 할당, 어느 주에도 속하지 않으면 NaN)
+def assign_week_bucket(created_at, week_ranges):
+    weeks = sorted(week_ranges, key=lambda w: week_ranges[w][0])
+    bins = pd.IntervalIndex.from_tuples([week_ranges[w] for w in weeks], closed='both')
+    return pd.cut(created_at, bins=bins).cat.rename_categories(weeks)
+
+# 각 주차 범위 설정 (기준 시각 now로부터 7일 단위, week4가 가장 최근 주)
+def compute_week_ranges(now):
+    return {
         'week4': (now - pd.Timedelta(days=6), now),
         'week3': (now - pd.Timedelta(days=13), now - pd.Timedelta(days=7)),
         'week2': (now - pd.Timedelta(days=20), now - pd.Timedelta(days=14)),
         'week1': (now - pd.Timedelta(days=27), now - pd.Timedelta(days=21)),
     }
+
+# Trial Week 번호(1부터)의 시작일 / 종료일 (trial 시작일이 같으면 rerun 간 캐시 재사용)
+@st.cache_data(show_spinner=False)
+def trial_week_bounds(trial_start: pd.Timestamp, week_num: int) -> tuple[pd.Timestamp, pd.Timestamp]:
+    week_start = pd.Timestamp(trial_start) + pd.Timedelta(days=(week_num - 1) * 7)
+    return week_start, week_start + pd.Timedelta(days=6)
+
+# 주차 범위 설정 (Recent 4 Weeks 모드에서만 사용)
+if view_mode == "Recent 4 Weeks":
+    # 기준 날짜: 오늘 날짜 정오 기준
+    week_ranges = compute_week_ranges(pd.Timestamp.now().normalize() + pd.Timedelta(hours=12))
     
-    # 주차 버킷 할당 함수
-    def assign_week_bucket(date):
-        if pd.isna(date):
-            return None
-        # date는 이미 timezone-naive 상태
-        for week, (start, end) in week_ranges.items():
-            if start <= date <= end:
-                return week
-        return None
-    
-    # 이 섹션에서만 week_bucket 할당
-    df_usage_org['week_bucket'] = df_usage_org['created_at'].apply(assign_week_bucket)
+    # week_bucket은 여기서 한 번만 할당하고 아래 섹션들의 주차 선택에서도 재사용
+    df_usage_org['week_bucket'] = assign_week_bucket(df_usage_org['created_at'], week_ranges)
+    # 최근 4주에 이벤트가 하나도 없으면 주차 선택이 비지 않도록 네 주를 모두 보여줌 (선택 값이 None이 되지 않게)
+    recent_week_options = sorted(df_usage_org['week_bucket'].dropna().unique(), reverse=True) or sorted(week_ranges, reverse=True)
 
 if view_mode == f"Trial Period (Trial Start Date: {trial_start})":
     # trial_start_date 기준으로 주차 계산
-    df_usage_org['week_from_trial'] = ((df_usage_org['created_at'] - df_usage_org['trial_start_date'])
-                                .dt.days // 7 + 1)
+    week_from_trial = (df_usage_org['created_at'] - df_usage_org['trial_start_date']).dt.days // 7 + 1
     
     # trial_start_date와 같은 날짜(0)도 1주차로 처리
-    df_usage_org.loc[df_usage_org['week_from_trial'] <= 1, 'week_from_trial'] = 1
+    week_from_trial = week_from_trial.clip(lower=1)
     
-    # week 포맷팅 (소수점 제거)
-    df_usage_org['week_from_trial'] = df_usage_org['week_from_trial'].fillna(1)  # nan을 1로 처리
-    df_usage_org['week_from_trial'] = df_usage_org['week_from_trial'].map(lambda x: f'Trial Week {int(x)}')
+    # week 포맷팅 (소수점 제거, 라벨 문자열은 고유 주차마다 한 번만 만들어 category로 저장)
+    week_from_trial = week_from_trial.fillna(1).astype(int)  # nan을 1로 처리
+    df_usage_org['week_from_trial'] = pd.Categorical(week_from_trial).rename_categories(lambda w: f'Trial Week {w}')
     
-    df_chart = df_usage_org.groupby(['week_from_trial', 'agent_type']).size().reset_index(name='count')
+    df_chart = df_usage_org.groupby(['week_from_trial', 'agent_type'], observed=True).size().reset_index(name='count')
     
     # 누락된 week_from_trial, agent_type 조합 채워넣기
     all_weeks = sorted(df_usage_org['week_from_trial'].unique())
@@ -673,7 +674,7 @@ if view_mode == f"Trial Period (Trial Start Date: {trial_start})":
     df_chart = pd.merge(all_combinations, df_chart, on=['week_from_trial', 'agent_type'], how='left')
     df_chart['count'] = df_chart['count'].fillna(0).astype(int)
 else:
-    df_chart = df_usage_org.groupby(['week_bucket', 'agent_type']).size().reset_index(name='count')
+    df_chart = df_usage_org.groupby(['week_bucket', 'agent_type'], observed=True).size().reset_index(name='count')
 
     # 누락된 week_bucket, agent_type 조합 채워넣기
     all_weeks = list(week_ranges.keys())
@@ -682,76 +683,78 @@ else:
     df_chart = pd.merge(all_combinations, df_chart, on=['week_bucket', 'agent_type'], how='left')
     df_chart['count'] = df_chart['count'].fillna(0).astype(int)
 
-# Pivot Table - 모드에 따라 컬럼 이름 변경
-if view_mode == "Recent 4 Weeks":
-    df_week_table = df_chart.pivot_table(
-        index='agent_type',
-        columns='week_bucket',
-        values='count',
-        fill_value=0,
-        aggfunc='sum'
-    )
+# 선택된 기간에 이벤트가 없으면 pivot_table(margins=True)가 Total 행/열을 만들지 않으므로 표/차트를 건너뜀
+if df_chart.empty:
+    st.info("No usage in the selected weeks.")
 else:
-    df_week_table = df_chart.pivot_table(
-        index='agent_type',
-        columns='week_from_trial',
-        values='count',
-        fill_value=0,
-        aggfunc='sum'
-    )
-
-df_week_table['Total'] = df_week_table.sum(axis=1)
-df_week_table = df_week_table.sort_values('Total', ascending=False)
+    # Pivot Table + Total 행/열 - 모드에 따라 컬럼 이름 변경
+    if view_mode == "Recent 4 Weeks":
+        df_week_table = df_chart.pivot_table(
+            index='agent_type',
+            columns='week_bucket',
+            values='count',
+            fill_value=0,
+            aggfunc='sum',
+            margins=True,
+            margins_name='Total',
+            observed=True
+        )
+    else:
+        df_week_table = df_chart.pivot_table(
+            index='agent_type',
+            columns='week_from_trial',
+            values='count',
+            fill_value=0,
+            aggfunc='sum',
+            margins=True,
+            margins_name='Total',
+            observed=True
+        )
 
-# Trial Week 컬럼들을 숫자 순서로 정렬
-if view_mode != "Recent 4 Weeks":
-    # Trial Week 컬럼들만 추출하고 숫자로 정렬
-    trial_week_cols = [col for col in df_week_table.columns if col != 'Total' and 'Trial Week' in str(col)]
-    # Trial Week 숫자 추출해서 정렬
-    trial_week_cols.sort(key=lambda x: int(x.split()[-1]))
-    df_week_table = df_week_table[['Total'] + trial_week_cols]
-else:
-    df_week_table = df_week_table[['Total'] + [col for col in df_week_table.columns if col != 'Total']]
+    week_cols = [col for col in df_week_table.columns if col != 'Total']
 
-df_week_table.loc['Total'] = df_week_table.sum(numeric_only=True)
+    # Trial Week 컬럼들을 숫자 순서로 정렬
+    if view_mode != "Recent 4 Weeks":
+        week_cols.sort(key=lambda x: int(x.split()[-1]))
 
-# 0을 '-'로 대체
-df_week_table = df_week_table.replace(0, '-')
+    # Total 기준으로 기능 정렬 (Total 행은 맨 아래 유지), Total 컬럼을 맨 앞으로
+    agent_order = df_week_table['Total'].drop('Total').sort_values(ascending=False).index.tolist()
+    df_week_table = df_week_table.loc[agent_order + ['Total'], ['Total'] + week_cols]
 
-# 차트 정렬 순서 설정
-sorted_agent_order = df_week_table.drop("Total").index.tolist()
+    # 차트 정렬 순서 설정
+    sorted_agent_order = df_week_table.drop("Total").index.tolist()
 
-if view_mode == "Recent 4 Weeks":
-    df_chart['agent_type'] = pd.Categorical(df_chart['agent_type'], categories=sorted_agent_order, ordered=True)
-    df_chart = df_chart.sort_values('agent_type')
+    if view_mode == "Recent 4 Weeks":
+        df_chart['agent_type'] = pd.Categorical(df_chart['agent_type'], categories=sorted_agent_order, ordered=True)
+        df_chart = df_chart.sort_values('agent_type')
     
-    left, right = st.columns([6, 6])
-    with left:
-        chart_week = alt.Chart(df_chart).mark_line(point=True).encode(
-            x=alt.X('week_bucket:N', title='Week', axis=alt.Axis(labelAngle=0)),
-            y=alt.Y('count:Q', title='Event Count'),
-            color=alt.Color('agent_type:N', title='Function', sort=sorted_agent_order),
-            tooltip=['agent_type', 'count']
-        ).properties(width=600, height=300)
+        left, right = st.columns([6, 6])
+        with left:
+            chart_week = alt.Chart(df_chart).mark_line(point=True).encode(
+                x=alt.X('week_bucket:N', title='Week', axis=alt.Axis(labelAngle=0)),
+                y=alt.Y('count:Q', title='Event Count'),
+                color=alt.Color('agent_type:N', title='Function', sort=sorted_agent_order),
+                tooltip=['agent_type', 'count']
+            ).properties(width=600, height=300)
         
-        st.altair_chart(chart_week, use_container_width=True)
-else:
-    df_chart['agent_type'] = pd.Categorical(df_chart['agent_type'], categories=sorted_agent_order, ordered=True)
-    df_chart = df_chart.sort_values(['week_from_trial', 'agent_type'])
+            st.altair_chart(chart_week, use_container_width=True)
+    else:
+        df_chart['agent_type'] = pd.Categorical(df_chart['agent_type'], categories=sorted_agent_order, ordered=True)
+        df_chart = df_chart.sort_values(['week_from_trial', 'agent_type'])
     
-    left, right = st.columns([6, 6])
-    with left:
-        chart_week = alt.Chart(df_chart).mark_line(point=True).encode(
-            x=alt.X('week_from_trial:N', title='Trial Week', axis=alt.Axis(labelAngle=0)),
-            y=alt.Y('count:Q', title='Event Count'),
-            color=alt.Color('agent_type:N', title='Function', sort=sorted_agent_order),
-            tooltip=['agent_type', 'count']
-        ).properties(width=600, height=300)
+        left, right = st.columns([6, 6])
+        with left:
+            chart_week = alt.Chart(df_chart).mark_line(point=True).encode(
+                x=alt.X('week_from_trial:N', title='Trial Week', axis=alt.Axis(labelAngle=0)),
+                y=alt.Y('count:Q', title='Event Count'),
+                color=alt.Color('agent_type:N', title='Function', sort=sorted_agent_order),
+                tooltip=['agent_type', 'count']
+            ).properties(width=600, height=300)
         
-        st.altair_chart(chart_week, use_container_width=True)
+            st.altair_chart(chart_week, use_container_width=True)
 
-with right:
-    st.dataframe(df_week_table.astype(object), use_container_width=True)
+    with right:
+        st.dataframe(df_week_table.style.format(format_dash_zero), use_container_width=True)
 
 
 # 📊 Daily usage 시계열
@@ -759,102 +762,16 @@ st.subheader("📊 Daily Function Usage for a Selected Week")
 
 
 
-# 📅 주차 선택 - view mode에 따라 다르게
-if view_mode == "Recent 4 Weeks":
-    # week_bucket이 없으면 생성
-    if 'week_bucket' not in df_usage_org.columns:
-        # 기준 날짜: 오늘 날짜 정오 기준
-        now = pd.Timestamp.now().normalize() + pd.Timedelta(hours=12)
-        
-        # 각 주차 범위 설정
-        week_ranges = {
-            'week4': (now - pd.Timedelta(days=6), now),
-            'week3': (now - pd.Timedelta(days=13), now - pd.Timedelta(days=7)),
-            'week2': (now - pd.Timedelta(days=20), now - pd.Timedelta(days=14)),
-            'week1': (now - pd.Timedelta(days=27), now - pd.Timedelta(days=21)),
-        }
-        
-        # 주차 버킷 할당 함수
-        def assign_week_bucket(date):
-            if pd.isna(date):
-                return None
-            for week, (start, end) in week_ranges.items():
-                if start <= date <= end:
-                    return week
-            return None
-        
-        df_usage_org['week_bucket'] = df_usage_org['created_at'].apply(assign_week_bucket)
-    
-    week_options = sorted(df_usage_org['week_bucket'].dropna().unique(), reverse=True)
-    selected_week = st.selectbox("Select Week", week_options, key="daily_select_week")
-    
-    # 선택된 주차의 날짜 범위 계산
-    week_start, week_end = week_ranges[selected_week]
-    week_dates = pd.date_range(week_start, week_end).date
-else:
-    # Trial Period Mode
-    # 모든 가능한 Trial Week 생성 (1주차부터 현재까지)
-    max_week = ((pd.Timestamp.now() - df_usage_org['trial_start_date'].min()).days // 7) + 1
-    week_options = [f'Trial Week {i}' for i in range(max_week, 0, -1)]
-    selected_week = st.selectbox("Select Week", week_options, key="daily_select_week")
-    
-    # 선택된 Trial Week의 숫자 추출
-    week_num = int(selected_week.split()[-1])
-    
-    # 해당 주차의 날짜 범위 계산
-    trial_start = pd.to_datetime(df_usage_org['trial_start_date'].iloc[0])
-    week_start = trial_start + pd.Timedelta(days=(week_num-1)*7)
-    week_end = week_start + pd.Timedelta(days=6)
-    week_dates = pd.date_range(week_start, week_end).date
-
-# 📆 선택된 주간 데이터 필터링 (df_usage_active 사용)
-df_week = df_usage_active[df_usage_active['created_at'].dt.date.isin(week_dates)]
-
-# 📊 일별-기능별 집계
-agent_types = df_usage_active['agent_type'].unique()  # 전체 기능 목록 사용
-
-# 선택된 주의 모든 날짜와 기능 조합 생성
-date_range = pd.date_range(start=min(week_dates), end=max(week_dates), freq='D')
-all_combinations = pd.MultiIndex.from_product(
-    [date_range, agent_types],
-    names=['created_at', 'agent_type']
-).to_frame(index=False)
-
-# 실제 데이터 집계
-df_day = df_week.groupby([df_week['created_at'].dt.date, 'agent_type']).size().reset_index(name='count')
-df_day['created_at'] = pd.to_datetime(df_day['created_at'])
-
-# 모든 날짜-기능 조합에 대해 데이터 병합 (없는 날짜는 0으로 표시)
-df_day = pd.merge(all_combinations, df_day, on=['created_at', 'agent_type'], how='left')
-df_day['count'] = df_day['count'].fillna(0).astype(int)
-
-# 📊 기능별 정렬 기준 계산 (많이 쓴 순서 → 아래층부터 쌓임)
-agent_order_by_volume = (
-    df_day.groupby('agent_type')['count']
-    .sum()
-    .sort_values(ascending=False)
-    .index.tolist()
-)
-agent_order_for_stack = agent_order_by_volume  # 많이 쓴 순서대로 스택
-
-# 🔁 정렬 순서 적용
-df_day['agent_type'] = pd.Categorical(
-    df_day['agent_type'],
-    categories=agent_order_for_stack,
-    ordered=True
-)
-df_day = df_day.sort_values(['created_at', 'agent_type'], ascending=[True, True])
-
-# 📈 Plotly 차트 + 📋 테이블
-left2, right2 = st.columns([6, 6])
-with left2:
-    # 📊 Plotly stacked bar chart
+# 📊 Plotly stacked bar chart
+@st.cache_data(show_spinner=False, max_entries=32)
+def build_daily_function_fig(df_day: pd.DataFrame, agent_order: list, week_first_day, week_last_day):
+    """Build the stacked daily-by-function bar chart for the selected week."""
     fig_day = px.bar(
         df_day,
         x="created_at",
         y="count",
         color="agent_type",
-        category_orders={"agent_type": agent_order_for_stack},
+        category_orders={"agent_type": agent_order},
         color_discrete_sequence=px.colors.qualitative.Set1,
         labels={"created_at": "Date", "count": "Event Count", "agent_type": "Function"},
     )
@@ -875,46 +792,98 @@ with left2:
         tickformat="%m-%d",
         type='date',
         dtick="D1",  # 하루 간격으로 눈금 표시
-        range=[min(week_dates), max(week_dates)]  # 선택된 주의 전체 날짜 범위 표시
+        range=[week_first_day, week_last_day]  # 선택된 주의 전체 날짜 범위 표시
     )
     
-    st.plotly_chart(fig_day, use_container_width=True)
-
-with right2:
-    # 📊 집계 테이블 준비
-    df_day_table = df_day.pivot_table(
-        index='agent_type',
-        columns='created_at',
-        values='count',
-        fill_value=0,
-        aggfunc='sum'
+    return fig_day
+
+# 주차 선택과 그에 따른 차트/테이블만 다시 실행되도록 fragment로 분리
+@st.fragment
+def render_daily_function_section(df_usage_org: pd.DataFrame, df_usage_active: pd.DataFrame):
+    """Render the week selector with the daily function chart and table for that week."""
+    # 📅 주차 선택 - view mode에 따라 다르게
+    if view_mode == "Recent 4 Weeks":
+        selected_week = st.selectbox("Select Week", recent_week_options, key="daily_select_week")
+
+        # 선택된 주차의 날짜 범위 계산
+        week_start, week_end = week_ranges[selected_week]
+        week_dates = pd.date_range(week_start, week_end).normalize()
+    else:
+        # Trial Period Mode
+        # 모든 가능한 Trial Week 생성 (1주차부터 현재까지)
+        max_week = ((pd.Timestamp.now() - df_usage_org['trial_start_date'].min()).days // 7) + 1
+        week_options = [f'Trial Week {i}' for i in range(max_week, 0, -1)]
+        selected_week = st.selectbox("Select Week", week_options, key="daily_select_week")
+
+        # 선택된 Trial Week의 숫자 추출
+        week_num = int(selected_week.split()[-1])
+
+        # 해당 주차의 날짜 범위 계산
+        week_start, week_end = trial_week_bounds(df_usage_org['trial_start_date'].iat[0], week_num)
+        week_dates = pd.date_range(week_start, week_end).normalize()
+
+    # 📆 선택된 주간 데이터 필터링 (df_usage_active 사용, datetime64 범위 비교)
+    created_at = df_usage_active['created_at']
+    df_week = df_usage_active[(created_at >= week_dates[0]) & (created_at < week_dates[-1] + pd.Timedelta(days=1))]
+
+    # 📊 일별-기능별 집계
+    agent_types = df_usage_active['agent_type'].unique()  # 전체 기능 목록 사용
+
+    # 실제 데이터 집계 후 선택된 주의 모든 날짜-기능 조합으로 reindex (없는 날짜는 0으로 표시)
+    date_range = pd.date_range(start=min(week_dates), end=max(week_dates), freq='D')
+    df_day = (
+        df_week
+        .groupby([df_week['day_bucket'].rename('created_at'), 'agent_type'], observed=True)
+        .size()
+        .unstack('agent_type', fill_value=0)
+        .reindex(index=date_range, columns=agent_types, fill_value=0)
+        .rename_axis(index='created_at', columns='agent_type')
+        .stack()
+        .astype('int32')  # 차트로 보내는 count는 int32로 충분 (직렬화 크기 절반)
+        .reset_index(name='count')
     )
-    
-    # 컬럼 이름을 mm-dd 형식으로 변경
-    df_day_table.columns = pd.to_datetime(df_day_table.columns).strftime('%m-%d')
-    
-    # 날짜 컬럼을 시간순으로 정렬 (실제 데이터의 연도 사용)
-    date_columns = [col for col in df_day_table.columns if col != 'Total']
-    # 실제 데이터에서 해당 날짜의 연도를 찾아서 정렬
-    def get_actual_date_for_day_sorting(date_str):
-        # mm-dd 형식의 날짜 문자열에 대해 실제 데이터에서 해당하는 전체 날짜 찾기
-        matching_dates = df_day[df_day['created_at'].dt.strftime("%m-%d") == date_str]['created_at']
-        if not matching_dates.empty:
-            return matching_dates.min()  # 가장 이른 날짜 사용
-        else:
-            return pd.to_datetime(f"2024-{date_str}")  # 기본값
-    
-    sorted_date_columns = sorted(date_columns, key=get_actual_date_for_day_sorting)
-    
-    df_day_table['Total'] = df_day_table.sum(axis=1)
-    df_day_table = df_day_table.sort_values('Total', ascending=False)
-    df_day_table = df_day_table[['Total'] + sorted_date_columns]
-    df_day_table.loc['Total'] = df_day_table.sum(numeric_only=True)
 
-    # 0을 '-'로 대체
-    df_day_table = df_day_table.replace(0, '-')
+    # 📊 기능별 정렬 기준 계산 (많이 쓴 순서 → 아래층부터 쌓임)
+    agent_order_by_volume = (
+        df_day.groupby('agent_type', observed=True)['count']
+        .sum()
+        .sort_values(ascending=False)
+        .index.tolist()
+    )
+    agent_order_for_stack = agent_order_by_volume  # 많이 쓴 순서대로 스택
+
+    # 🔁 정렬 순서 적용
+    df_day['agent_type'] = pd.Categorical(
+        df_day['agent_type'],
+        categories=agent_order_for_stack,
+        ordered=True
+    )
+    df_day = df_day.sort_values(['created_at', 'agent_type'], ascending=[True, True])
+
+    # 📈 Plotly 차트 + 📋 테이블
+    left2, right2 = st.columns([6, 6])
+    with left2:
+        st.plotly_chart(
+            build_daily_function_fig(df_day, agent_order_for_stack, min(week_dates), max(week_dates)),
+            use_container_width=True
+        )
+
+    with right2:
+        # 📊 집계 테이블 준비 (df_day는 날짜-기능 조합당 한 행이라 합계 없이 unstack만 하면 됨)
+        df_day_table = df_day.set_index(['agent_type', 'created_at'])['count'].unstack(fill_value=0)
+
+        # 컬럼(datetime)은 이미 시간순이므로 mm-dd 형식으로 표시만 변경
+        df_day_table.columns = df_day_table.columns.strftime('%m-%d')
+        sorted_date_columns = df_day_table.columns.tolist()
 
-    st.dataframe(df_day_table.astype(object), use_container_width=True)
+        df_day_table['Total'] = df_day_table.sum(axis=1)
+        df_day_table = df_day_table.sort_values('Total', ascending=False)
+        df_day_table = df_day_table[['Total'] + sorted_date_columns]
+        df_day_table.loc['Total'] = df_day_table.sum(numeric_only=True)
+
+        st.dataframe(df_day_table.style.format(format_dash_zero), use_container_width=True)
+
+render_daily_function_section(df_usage_org, df_usage_active)
 
 
 # 👥 Function Usage by User
@@ -936,12 +905,10 @@ selected_user = st.selectbox(
 
 # 📅 주차 선택 - view mode에 따라 다르게
 if view_mode == "Recent 4 Weeks":
-    week_options = sorted(df_usage_org['week_bucket'].dropna().unique(), reverse=True)
-    selected_week = st.selectbox("Select Week", week_options, key="user_week_select")
+    selected_week = st.selectbox("Select Week", recent_week_options, key="user_week_select")
     
     # 선택된 주차의 날짜 범위 계산
     week_start, week_end = week_ranges[selected_week]
-    week_dates = pd.date_range(week_start, week_end).date
 else:
     # Trial Period Mode
     # Trial Week 숫자 추출해서 내림차순 정렬
@@ -954,47 +921,68 @@ else:
     week_num = int(selected_week.split()[-1])
     
     # 해당 주차의 날짜 범위 계산
-    trial_start = pd.to_datetime(df_usage_org['trial_start_date'].iloc[0])
-    week_start = trial_start + pd.Timedelta(days=(week_num-1)*7)
-    week_end = week_start + pd.Timedelta(days=6)
-    week_dates = pd.date_range(week_start, week_end).date
-
-# 선택된 주간 데이터 필터링
-df_user_week = df_usage_org[df_usage_org['created_at'].dt.date.isin(week_dates)]
-
-# 기본 집계 데이터 준비 (전체 유저)
-df_user_stack_full = df_user_week.groupby(['user_name', 'agent_type']).size().reset_index(name='count')
-
-# 👉 기능 정렬 기준 정의 (많이 쓴 순)
-sorted_func_order = (
-    df_user_stack_full.groupby('agent_type')['count']
-    .sum().sort_values(ascending=False).index.tolist()
-)
-
-# ✅ 왼쪽: 차트용 - top 10 유저만 필터링
-top_users = (
-    df_user_stack_full.groupby('user_name')['count']
-    .sum().nlargest(10).index.tolist()
-)
-df_user_stack_chart = df_user_stack_full[df_user_stack_full['user_name'].isin(top_users)].copy()
-df_user_stack_chart['agent_type'] = pd.Categorical(
-    df_user_stack_chart['agent_type'],
-    categories=sorted_func_order,
-    ordered=True
-)
-df_user_stack_chart = df_user_stack_chart.sort_values(['user_name', 'agent_type'])
+    week_start, week_end = trial_week_bounds(df_usage_org['trial_start_date'].iat[0], week_num)
+
+# 일 x 유저 x 기능별 사용 횟수 (조직당 한 번만 집계, 주차/유저가 바뀌면 이 작은 프레임만 잘라서 사용)
+# view mode별 주차 컬럼이 붙기 전의 조직 프레임에서 집계해서 조직명만으로 캐시를 찾음 (프레임 해싱 없음)
+@st.cache_data(show_spinner=False, max_entries=32)
+def count_daily_usage(selected_org: str) -> pd.DataFrame:
+    """Count the organization's events per (day_bucket, user_name, agent_type)."""
+    return (
+        get_org_frames(selected_org)[0].groupby(['day_bucket', 'user_name', 'agent_type'], observed=True)
+        .size().reset_index(name='count')
+    )
 
-# 📊 시각화
-left, right = st.columns([7, 5])
-with left:
+# category 값별 합계 순위 (groupby 대신 category 코드에 bincount, 같은 합계는 category 순서 유지)
+def rank_categories(values: pd.Series, counts: np.ndarray) -> list:
+    """Return the categories of `values` present in the data, ordered by summed `counts` (descending)."""
+    totals = np.bincount(values.cat.codes.to_numpy(), weights=counts, minlength=len(values.cat.categories))
+    order = np.argsort(-totals, kind='stable')
+    return values.cat.categories.take(order[totals[order] > 0]).tolist()
+
+# 선택된 주간 필터링 + 집계 (유저/날짜 선택만 바뀌는 rerun에서는 캐시 사용)
+@st.cache_data(show_spinner=False, max_entries=32)
+def aggregate_user_week(selected_org: str, week_start: pd.Timestamp, week_end: pd.Timestamp):
+    """Slice the organization's daily counts to one week and total them per user and function.
+    Returns (df_week_counts, df_user_stack_full, sorted_func_order, top_users)."""
+    df_daily_counts = count_daily_usage(selected_org)
+    # 선택된 주간 데이터 필터링 (날짜 변환 없이 datetime64 범위 비교)
+    start_ts = week_start.normalize()
+    end_ts = week_end.normalize() + pd.Timedelta(days=1)
+    day_bucket = df_daily_counts['day_bucket']
+    df_week_counts = df_daily_counts[(day_bucket >= start_ts) & (day_bucket < end_ts)]
+
+    # 기본 집계 데이터 준비 (전체 유저)
+    df_user_stack_full = df_week_counts.groupby(['user_name', 'agent_type'], observed=True)['count'].sum().reset_index()
+    df_user_stack_full['count'] = df_user_stack_full['count'].astype('int32')
+
+    # 👉 기능 정렬 기준 정의 (많이 쓴 순)
+    counts = df_user_stack_full['count'].to_numpy()
+    sorted_func_order = rank_categories(df_user_stack_full['agent_type'], counts)
+
+    # ✅ 왼쪽: 차트용 - top 10 유저
+    top_users = rank_categories(df_user_stack_full['user_name'], counts)[:10]
+    return df_week_counts, df_user_stack_full, sorted_func_order, top_users
+
+df_week_counts, df_user_stack_full, sorted_func_order, top_users = aggregate_user_week(selected_org, week_start, week_end)
+# 차트용 프레임 - top 10 유저로 category를 제한해서 필터와 정렬 키를 한 번에 만듦 (top 10 밖의 유저는 NaN으로 빠짐)
+df_user_stack_chart = df_user_stack_full.assign(
+    user_name=pd.Categorical(df_user_stack_full['user_name'], categories=top_users),
+    agent_type=pd.Categorical(df_user_stack_full['agent_type'], categories=sorted_func_order, ordered=True),
+).dropna(subset=['user_name']).sort_values(['user_name', 'agent_type'])
+
+# 📊 유저별 기능 사용 stacked bar chart
+@st.cache_data(show_spinner=False, max_entries=32)
+def build_user_function_fig(df_user_stack_chart: pd.DataFrame, func_order: list, user_order: list):
+    """Build the stacked function-usage-by-user bar chart (top users only)."""
     fig = px.bar(
         df_user_stack_chart,
         x="user_name",
         y="count",
         color="agent_type",
         category_orders={
-            "agent_type": sorted_func_order,
-            "user_name": top_users
+            "agent_type": func_order,
+            "user_name": user_order
         },
         color_discrete_sequence=px.colors.qualitative.Set1,
         labels={"user_name": "User", "count": "Usage Count", "agent_type": "Function"},
@@ -1006,142 +994,123 @@ with left:
         legend_title="Function",
         height=350,
     )
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
+
+# Total 컬럼(맨 앞)과 Total 행(맨 아래) 추가 - 합계는 numpy 배열에서 한 번에 계산
+def add_totals(df_table: pd.DataFrame) -> pd.DataFrame:
+    """Prepend a 'Total' column, sort the rows by it (descending) and append a 'Total' row."""
+    values = df_table.to_numpy()
+    row_totals = values.sum(axis=1)
+    df_out = pd.DataFrame(
+        np.column_stack([row_totals, values]),
+        index=df_table.index.astype(object),
+        columns=pd.Index(['Total', *df_table.columns], name=df_table.columns.name),
+    ).sort_values('Total', ascending=False)
+    df_out.loc['Total'] = np.append(row_totals.sum(), values.sum(axis=0))
+    return df_out
+
+# 📊 시각화
+left, right = st.columns([7, 5])
+with left:
+    st.plotly_chart(build_user_function_fig(df_user_stack_chart, sorted_func_order, top_users), use_container_width=True)
 
 with right:
     if selected_user == "All Users":
-        # 전체 유저 요약 테이블
-        df_user_table = df_user_stack_full.pivot_table(
-            index='agent_type',  # agent_type을 행으로
-            columns='user_name',  # user를 열로
-            values='count',
-            aggfunc='sum',
-            fill_value=0
+        # 전체 유저 요약 테이블 (이미 (user, agent_type)별로 집계되어 있으므로 재집계 없이 unstack)
+        df_user_table = (
+            df_user_stack_full.set_index(['agent_type', 'user_name'])['count']  # agent_type을 행으로
+            .unstack(fill_value=0)  # user를 열로
+            .sort_index()  # 행 순서는 기능명 순 (Total 동점일 때 순서 유지)
         )
         
-        # Total 컬럼 추가 및 정렬
-        df_user_table['Total'] = df_user_table.sum(axis=1)
-        df_user_table = df_user_table.sort_values('Total', ascending=False)
-        df_user_table = df_user_table[['Total'] + [col for col in df_user_table.columns if col != 'Total']]
-        
-        # Total 행 추가
-        df_user_table.loc['Total'] = df_user_table.sum(numeric_only=True)
+        # Total 컬럼/행 추가 및 정렬
+        df_user_table = add_totals(df_user_table)
         
     else:
-        # 선택된 유저의 일별 상세 데이터
-        df_user_detail = df_user_week[df_user_week['user_name'] == selected_user]
+        # 선택된 유저의 일별 집계 데이터 (주간 일별 카운트에서 유저만 필터링)
+        df_user_detail = df_week_counts[df_week_counts['user_name'] == selected_user]
         
-        # 모든 날짜와 agent_type 조합 생성
+        # 기능 x 날짜 집계 (날짜는 행마다 strftime 하지 않고 주 시작일로부터의 일수 0~6을 키로 사용)
+        # 데이터가 없는 기능/날짜 조합은 reindex로 0을 채움 (행은 기능명 순)
         all_dates = pd.date_range(week_start, week_end).strftime('%m/%d')
-        all_agent_types = sorted_func_order
-        all_combinations = pd.MultiIndex.from_product(
-            [all_agent_types, all_dates],
-            names=['agent_type', 'date']
-        ).to_frame(index=False)
-        
-        # 실제 데이터 집계
-        df_user_detail['date'] = df_user_detail['created_at'].dt.strftime('%m/%d')
-        df_user_counts = df_user_detail.groupby(['agent_type', 'date']).size().reset_index(name='count')
-        
-        # 모든 조합과 실제 데이터 병합
-        df_user_counts = pd.merge(
-            all_combinations,
-            df_user_counts,
-            on=['agent_type', 'date'],
-            how='left'
-        ).fillna(0)
-        
-        # 피벗 테이블 생성
-        df_user_table = df_user_counts.pivot_table(
-            index='agent_type',
-            columns='date',
-            values='count',
-            fill_value=0
+        day_offset = (df_user_detail['day_bucket'] - week_start.normalize()).dt.days.rename('day')
+        df_user_table = (
+            df_user_detail.groupby(['agent_type', day_offset], observed=True, sort=False)['count'].sum()
+            .unstack(fill_value=0)
+            .reindex(index=sorted(sorted_func_order), columns=range(len(all_dates)), fill_value=0)
         )
+        # mm/dd 라벨은 7개 컬럼 이름에만 붙임
+        df_user_table.columns = pd.Index(all_dates, name='date')
         
-        # 날짜 컬럼을 시간순으로 정렬 (실제 데이터의 연도 사용)
-        date_columns = [col for col in df_user_table.columns if col != 'Total']
-        # 실제 데이터에서 해당 날짜의 연도를 찾아서 정렬
-        def get_actual_date_for_user_sorting(date_str):
-            # mm/dd 형식의 날짜 문자열에 대해 실제 데이터에서 해당하는 전체 날짜 찾기
-            matching_dates = df_user_detail[df_user_detail['created_at'].dt.strftime("%m/%d") == date_str]['created_at']
-            if not matching_dates.empty:
-                return matching_dates.min()  # 가장 이른 날짜 사용
-            else:
-                return pd.to_datetime(f"2024/{date_str}")  # 기본값
-        
-        sorted_date_columns = sorted(date_columns, key=get_actual_date_for_user_sorting)
-        
-        # Total 컬럼 추가 및 정렬
-        df_user_table['Total'] = df_user_table.sum(axis=1)
-        df_user_table = df_user_table.sort_values('Total', ascending=False)
-        df_user_table = df_user_table[['Total'] + sorted_date_columns]
-        
-        # Total 행 추가
-        df_user_table.loc['Total'] = df_user_table.sum(numeric_only=True)
+        # Total 컬럼/행 추가 및 정렬
+        df_user_table = add_totals(df_user_table)
     
-    st.dataframe(df_user_table.astype(object), use_container_width=True)
+    st.dataframe(df_user_table, use_container_width=True)
 
 
 # 📊 Response Time Analysis
 st.markdown("---")
 st.subheader("📈 LinqAlpha Response Time Analysis")
 
-# 데이터 전처리
-df_time = df_usage_org.copy()
-# 이상치 처리
-df_time.loc[df_time['time_to_first_byte'] <= 0, 'time_to_first_byte'] = None
-df_time.loc[df_time['time_to_first_byte'] > 300000, 'time_to_first_byte'] = None  # 5분 초과 제거
+# 데이터 전처리, 기본 통계량, 일별 집계는 조직별로 한 번만 계산하고
+# 날짜 / 주차 선택 rerun에서는 조직명과 오늘 날짜만으로 캐시를 찾음 (프레임 해싱 없음)
+@st.cache_data(show_spinner=False, max_entries=32)
+def prepare_response_times(selected_org: str, today: pd.Timestamp):
+    """Return (df_time, (median, p95, mean), daily_stats) for one organization.
+    Only requests from RESPONSE_TIME_START up to (not including) `today` are used, so `today`
+    is part of the cache key. daily_stats holds the daily median response time and request count."""
+    df_usage_org = get_org_frames(selected_org)[0]
+    # 분석 기간 밖의 행은 먼저 걸러내서 아래 통계 / 집계가 필요한 행만 보도록 함
+    created_at = df_usage_org['created_at']
+    in_range = (created_at >= RESPONSE_TIME_START) & (created_at < today)
+    df_time = df_usage_org.loc[in_range, ['created_at', 'agent_type', 'time_to_first_byte', 'id']].copy()
+    # 이상치 처리 (0 이하 / 5분 초과 제거)와 ms -> 초 변환을 배열 하나에서 한 번에 처리
+    response_ms = df_time['time_to_first_byte'].to_numpy(dtype='float64', copy=True)
+    response_ms[(response_ms <= 0) | (response_ms > 300000)] = np.nan
+    df_time['time_to_first_byte'] = response_ms / 1000  # 표시 값에 float32 오차가 생기지 않도록 float64 유지
+
+    # 중앙값과 95퍼센타일은 quantile 한 번으로 같이 계산
+    median_time, p95_time = df_time['time_to_first_byte'].quantile([0.5, 0.95])
+    mean_time = df_time['time_to_first_byte'].mean()
+
+    # 시계열 데이터 준비 (로드 시 만든 자정 기준 datetime64 컬럼 재사용, Python date 객체 생성 없음)
+    df_time['date'] = df_usage_org.loc[in_range, 'day_bucket']
+    daily_stats = df_time.groupby('date').agg({
+        'time_to_first_byte': 'median',
+        'id': 'count'
+    }).reset_index()
+    return df_time, (median_time, p95_time, mean_time), daily_stats
 
-# ms를 초로 변환
-df_time['time_to_first_byte'] = df_time['time_to_first_byte'] / 1000
+df_time, (median_time, p95_time, mean_time), daily_stats = prepare_response_times(
+    selected_org, pd.Timestamp.now().normalize()
+)
 
-# 기본 통계량 표시
+# 기본 통계량 표시 (아래 차트와 표도 모두 같은 분석 기간 기준)
+st.caption(f"Requests from {RESPONSE_TIME_START:%Y-%m-%d} through yesterday")
 col1, col2, col3 = st.columns(3)
 with col1:
-    median_time = df_time['time_to_first_byte'].median()
     st.metric("Median Response Time", f"{median_time:.1f} sec")
 with col2:
-    mean_time = df_time['time_to_first_byte'].mean()
     st.metric("Average Response Time", f"{mean_time:.1f} sec")
 with col3:
-    p95_time = df_time['time_to_first_byte'].quantile(0.95)
     st.metric("95th Percentile", f"{p95_time:.1f} sec")
 
-# Matplotlib을 사용한 시계열 시각화
-plt.style.use('seaborn')
-fig_mpl, ax = plt.subplots(figsize=(12, 6))
-
-# 시계열 데이터 준비
-df_time['date'] = df_time['created_at'].dt.date
-daily_stats = df_time.groupby('date').agg({
-    'time_to_first_byte': 'median',
-    'id': 'count'
-}).reset_index()
-
-# 2025년 4월 1일 이후, 오늘 제외 데이터만 필터링
-start_date = pd.Timestamp('2025-04-01').date()
-end_date = pd.Timestamp.now().date() - pd.Timedelta(days=1)
-daily_stats = daily_stats[
-    (daily_stats['date'] >= start_date) & 
-    (daily_stats['date'] <= end_date)
-]
-
-# 시계열 플롯
-ax.plot(daily_stats['date'], daily_stats['time_to_first_byte'], 
-        marker='o', linestyle='-', linewidth=2, markersize=6)
-
-# 축 레이블과 제목
-ax.set_xlabel('Date')
-ax.set_ylabel('Response Time (seconds)')
-ax.set_title('Daily Median Response Time (Matplotlib)')
-
-# x축 날짜 포맷 조정
-plt.xticks(rotation=45)
-plt.tight_layout()
+# 일별 중앙값 시계열 플롯 (Plotly - 브라우저에서 렌더링)
+@st.cache_data(show_spinner=False, max_entries=32)
+def build_daily_median_fig(daily_stats: pd.DataFrame):
+    """Build the daily median response time line chart."""
+    fig = px.line(
+        daily_stats,
+        x='date',
+        y='time_to_first_byte',
+        markers=True,
+        title='Daily Median Response Time',
+        labels={'date': 'Date', 'time_to_first_byte': 'Response Time (seconds)'}
+    )
+    fig.update_layout(height=400, xaxis_tickangle=-45)
+    return fig
 
-# Streamlit에 Matplotlib 차트 표시
-st.pyplot(fig_mpl)
+st.plotly_chart(build_daily_median_fig(daily_stats), use_container_width=True)
 
 
 # 날짜 선택기 추가
@@ -1152,24 +1121,29 @@ selected_date = st.selectbox(
     index=0
 )
 
+# 기능별 응답 시간 집계 (선택 날짜 표와 전체 표가 같은 groupby 경로를 사용, 컬럼은 표시 순서대로 지정)
+def summarize_by_function(df_time: pd.DataFrame, **aggs) -> pd.DataFrame:
+    """Aggregate time_to_first_byte per agent_type with the given named aggregations."""
+    return df_time.groupby('agent_type', observed=True)['time_to_first_byte'].agg(**aggs)
+
 # 선택된 날짜가 있을 경우에만 상세 통계 표시
 if selected_date:
-    selected_date = pd.to_datetime(selected_date).date()
-    selected_date_data = df_time[df_time['date'] == selected_date].copy()
+    selected_date_data = df_time[df_time['date'].eq(pd.Timestamp(selected_date))]
     
     st.markdown(f"### 📊 Detailed Analysis for {selected_date}")
     
-    # Function별 통계 테이블 먼저 계산
-    func_stats = selected_date_data.groupby('agent_type').agg({
-        'time_to_first_byte': ['count', 'mean', 'median', 'max']
-    }).round(1)
-    func_stats.columns = ['Count', 'Mean (sec)', 'Median (sec)', 'Max (sec)']
+    # Function별 통계 테이블 먼저 계산 (응답 시간 컬럼 하나만 그룹핑해서 표시 순서대로 한 번에 집계)
+    func_stats = summarize_by_function(
+        selected_date_data,
+        **{'Count': 'count', 'Median (sec)': 'median', 'Mean (sec)': 'mean', 'Max (sec)': 'max'}
+    ).round(1)
     
     # 원본 데이터 수와 필터링된 데이터 수 계산
     total_raw_requests = len(selected_date_data)
     valid_requests = func_stats['Count'].sum()
     
     # 기본 통계
+    day_median, day_mean, day_max = selected_date_data['time_to_first_byte'].agg(['median', 'mean', 'max'])
     col1, col2, col3, col4 = st.columns(4)
     with col1:
         st.metric(
@@ -1178,39 +1152,43 @@ if selected_date:
             help="Total number of requests (number of requests with valid response time)"
         )
     with col2:
-        st.metric("Median Response Time", f"{selected_date_data['time_to_first_byte'].median():.1f} sec")
+        st.metric("Median Response Time", f"{day_median:.1f} sec")
     with col3:
-        st.metric("Mean Response Time", f"{selected_date_data['time_to_first_byte'].mean():.1f} sec")
+        st.metric("Mean Response Time", f"{day_mean:.1f} sec")
     with col4:
-        st.metric("Max Response Time", f"{selected_date_data['time_to_first_byte'].max():.1f} sec")
+        st.metric("Max Response Time", f"{day_max:.1f} sec")
 
-    # Function별 통계 테이블 열 순서 변경
-    func_stats = func_stats[['Count', 'Median (sec)', 'Mean (sec)', 'Max (sec)']]
+    # Function별 통계 테이블 정렬
     func_stats = func_stats.sort_values('Count', ascending=False)
     
-    # 0을 '-'로 대체
-    func_stats = func_stats.replace(0, '-')
-    
     st.markdown("#### Function Statistics")
-    st.dataframe(func_stats.astype(object), use_container_width=True)
+    st.dataframe(func_stats.style.format(format_dash_zero, na_rep='-'), use_container_width=True)
 
-    # Slow Requests (상위 10개)
+    # Slow Requests (상위 10개) - 전체 정렬 대신 np.partition으로 10번째 값을 구해 후보만 정렬
     st.markdown("#### Slowest Requests")
-    slow_requests = selected_date_data.nlargest(10, 'time_to_first_byte')[
+    response_times = selected_date_data['time_to_first_byte'].to_numpy()
+    is_missing = np.isnan(response_times)
+    slow_idx = np.flatnonzero(~is_missing)
+    if len(slow_idx) > 10:
+        tenth_largest = np.partition(response_times[slow_idx], -10)[-10]
+        slow_idx = slow_idx[response_times[slow_idx] >= tenth_largest]
+    # 같은 값이면 먼저 나온 요청 우선 (stable 정렬)
+    slow_idx = slow_idx[np.argsort(-response_times[slow_idx], kind='stable')]
+    # 10개가 안 되면 응답 시간이 없는 요청(이상치 제거분)으로 뒤를 채움 (nlargest와 동일)
+    slow_idx = np.concatenate([slow_idx, np.flatnonzero(is_missing)])[:10]
+    slow_requests = selected_date_data.iloc[slow_idx][
         ['created_at', 'agent_type', 'time_to_first_byte', 'id']
     ].copy()
     slow_requests['created_at'] = slow_requests['created_at'].dt.strftime('%Y-%m-%d %H:%M:%S')
     slow_requests.columns = ['Timestamp', 'Function', 'Response Time (sec)', 'Request ID']
-    slow_requests = slow_requests.sort_values('Response Time (sec)', ascending=False)
     st.dataframe(slow_requests, use_container_width=True)
 
-# 두 번째 줄: 히스토그램과 도표
-left_col, right_col = st.columns([3, 2])  # 히스토그램이 더 넓게
-
-with left_col:
-    # 히스토그램
+# 응답 시간 히스토그램
+@st.cache_data(show_spinner=False, max_entries=32)
+def build_response_time_fig(df_response_times: pd.DataFrame, median_time: float, mean_time: float):
+    """Build the response time histogram with median/mean markers."""
     fig2 = px.histogram(
-        df_time,
+        df_response_times,
         x='time_to_first_byte',
         nbins=50,
         title='Distribution of Response Times',
@@ -1238,19 +1216,38 @@ with left_col:
         bargap=0.1,
         showlegend=True
     )
-    st.plotly_chart(fig2, use_container_width=True)
+    return fig2
+
+# 전체 기간 기능별 응답 시간 (조직별 캐시, 날짜 선택 rerun에서는 다시 집계하지 않음)
+@st.cache_data(show_spinner=False, max_entries=32)
+def overall_function_stats(selected_org: str, today: pd.Timestamp) -> pd.DataFrame:
+    """Per-function mean/median/count of the organization's response times, sorted by count."""
+    df_time = prepare_response_times(selected_org, today)[0]
+    func_stats = (
+        summarize_by_function(df_time, **{'Mean (sec)': 'mean', 'Median (sec)': 'median', 'Count': 'count'})
+        .rename_axis('Function')
+        .reset_index()
+    )
+    return func_stats.sort_values('Count', ascending=False)  # Count 기준 내림차순
+
+# 두 번째 줄: 히스토그램과 도표
+left_col, right_col = st.columns([3, 2])  # 히스토그램이 더 넓게
+
+with left_col:
+    # 히스토그램
+    st.plotly_chart(
+        build_response_time_fig(df_time[['time_to_first_byte']], median_time, mean_time),
+        use_container_width=True
+    )
 
 with right_col:
     # 함수별 응답 시간 (Count 기준 내림차순 정렬)
     st.markdown("### 🔍 Response Time by Function")
-    func_stats = df_time.groupby('agent_type')['time_to_first_byte'].agg([
-        'mean', 'median', 'count'
-    ]).reset_index()
-    func_stats.columns = ['Function', 'Mean (sec)', 'Median (sec)', 'Count']
-    func_stats = func_stats.sort_values('Count', ascending=False)  # Count 기준 내림차순
-    
-    # 0을 '-'로 대체
-    func_stats = func_stats.replace(0, '-')
+    func_stats = overall_function_stats(selected_org, pd.Timestamp.now().normalize())
     
-    st.dataframe(func_stats.round(2).astype(object), use_container_width=True, hide_index=True)  # hide_index=True 추가
+    st.dataframe(
+        func_stats.round(2).style.format(format_dash_zero, subset=func_stats.columns.drop('Function'), na_rep='-'),
+        use_container_width=True,
+        hide_index=True
+    )  # hide_index=True 추가
 